@@ -0,0 +1,136 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+from .config import settings
+from .books import book_fetcher
+from .orderbook import OrderBook
+
+_DONE = object()
+
+class BookCache:
+    """
+    进程级订单簿缓存，位于 scanner / ExecutionEngine / RiskMonitor 与 BookFetcher 之间：
+    - 按 token 的 TTL (默认 BOOK_CACHE_TTL_SECONDS，可单独 set_ttl)
+    - 请求合并：同一 token 同时只有一个在途请求，其余调用者等待同一结果
+    - 按容量 (BOOK_CACHE_MAX_SIZE) 做 LRU 淘汰
+    接口与 BookFetcher 相同 (fetch_book / fetch_books / iter_books)，可直接替换。
+    """
+    def __init__(self, fetcher=None, ttl: float = None, max_size: int = None):
+        self.fetcher = fetcher or book_fetcher
+        self.ttl = settings.BOOK_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_size = max_size or settings.BOOK_CACHE_MAX_SIZE
+        self._entries: "OrderedDict[str, Tuple[float, OrderBook]]" = OrderedDict()  # token -> (fetched_at, book)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._ttls: Dict[str, float] = {}
+        self._fetches: Set[asyncio.Task] = set() # 在途的拉取任务 (消费者提前退出时仍会跑完并唤醒等待者)
+        self.hits = 0
+        self.misses = 0
+
+    def set_ttl(self, token_id: str, ttl: Optional[float]):
+        if ttl is None:
+            self._ttls.pop(token_id, None)
+        else:
+            self._ttls[token_id] = ttl
+
+    def put(self, token_id: str, book: OrderBook, fetched_at: float = None):
+        self._entries[token_id] = (fetched_at or time.monotonic(), book)
+        self._entries.move_to_end(token_id)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            self._ttls.pop(evicted, None)
+
+    def peek(self, token_id: str, max_age: float = None) -> Optional[OrderBook]:
+        entry = self._entries.get(token_id)
+        if entry is None: return None
+        fetched_at, book = entry
+        ttl = self._ttls.get(token_id, self.ttl) if max_age is None else max_age
+        if time.monotonic() - fetched_at > ttl:
+            return None
+        self._entries.move_to_end(token_id)
+        return book
+
+    def invalidate(self, token_id: str):
+        self._entries.pop(token_id, None)
+
+    async def iter_books(self, token_ids: Iterable[str], max_age: float = None) -> AsyncIterator[Dict[str, OrderBook]]:
+        """
+        先产出缓存命中，再按分块到达顺序产出新拉取的订单簿，最后产出搭便车等待的在途结果。
+        max_age 可覆盖 TTL (如 0 表示强制刷新，但仍与在途请求合并)。
+        """
+        loop = asyncio.get_running_loop()
+        hits: Dict[str, OrderBook] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        owned: Dict[str, asyncio.Future] = {}
+        for token_id in dict.fromkeys(t for t in token_ids if t):
+            book = self.peek(token_id, max_age)
+            if book is not None:
+                hits[token_id] = book
+            elif token_id in self._inflight:
+                waiting[token_id] = self._inflight[token_id]
+            else:
+                owned[token_id] = self._inflight[token_id] = loop.create_future()
+        self.hits += len(hits) + len(waiting)
+        self.misses += len(owned)
+
+        if hits:
+            yield hits
+
+        if owned:
+            # 拉取在独立任务中进行：每个分块到达即写缓存并唤醒等待者，
+            # 不受本生成器的消费者在分块之间做什么 (如等待下单) 影响；这里只转交已就绪的结果
+            chunks: asyncio.Queue = asyncio.Queue()
+            task = loop.create_task(self._fetch_owned(owned, chunks))
+            self._fetches.add(task)
+            task.add_done_callback(self._fetches.discard)
+            while True:
+                chunk = await chunks.get()
+                if chunk is _DONE: break
+                if isinstance(chunk, BaseException): raise chunk
+                yield chunk
+
+        if waiting:
+            results = await asyncio.gather(*waiting.values(), return_exceptions=True)
+            shared = {t: b for t, b in zip(waiting, results) if isinstance(b, OrderBook)}
+            if shared:
+                yield shared
+
+    async def _fetch_owned(self, owned: Dict[str, asyncio.Future], chunks: asyncio.Queue):
+        try:
+            async for chunk in self.fetcher.iter_books(list(owned)):
+                now = time.monotonic()
+                ready = {}
+                for token_id, book in chunk.items():
+                    if token_id not in owned: continue
+                    self.put(token_id, book, now)
+                    self._resolve(token_id, owned[token_id], book)
+                    ready[token_id] = book
+                if ready:
+                    chunks.put_nowait(ready)
+        except Exception as e:
+            chunks.put_nowait(e)
+        finally:
+            # 未返回的 token (请求失败/服务端缺失) 也要释放等待者
+            for token_id, future in owned.items():
+                self._resolve(token_id, future, None)
+            chunks.put_nowait(_DONE)
+
+    def _resolve(self, token_id: str, future: asyncio.Future, book: Optional[OrderBook]):
+        if self._inflight.get(token_id) is future:
+            del self._inflight[token_id]
+        if not future.done():
+            future.set_result(book)
+
+    async def fetch_books(self, token_ids: Iterable[str], max_age: float = None) -> Dict[str, OrderBook]:
+        books: Dict[str, OrderBook] = {}
+        async for chunk in self.iter_books(token_ids, max_age):
+            books.update(chunk)
+        return books
+
+    async def fetch_book(self, token_id: str, max_age: float = None) -> Optional[OrderBook]:
+        return (await self.fetch_books([token_id], max_age)).get(token_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "inflight": len(self._inflight), "hits": self.hits, "misses": self.misses}
+
+book_cache = BookCache()
@@ -0,0 +1,58 @@
+import asyncio
+from loguru import logger
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from .config import settings
+from .http_client import http_client, HttpStatusError
+from .orderbook import OrderBook
+
+class BookFetcher:
+    """
+    批量订单簿拉取：通过 CLOB POST /books 一次请求多个 token，
+    按 BOOK_BATCH_SIZE 分块，分块之间以 BOOK_FETCH_CONCURRENCY 并发。
+    返回解析好的 OrderBook，按 token_id 索引。
+    """
+    def __init__(self, host: str = None):
+        self.host = host or settings.CLOB_HOST
+
+    def _chunks(self, token_ids: Iterable[str]) -> List[List[str]]:
+        unique = list(dict.fromkeys(t for t in token_ids if t))
+        size = max(1, settings.BOOK_BATCH_SIZE)
+        return [unique[i:i + size] for i in range(0, len(unique), size)]
+
+    async def _fetch_chunk(self, chunk: List[str]) -> Dict[str, OrderBook]:
+        try:
+            data = await http_client.post_json(f"{self.host}/books", [{"token_id": t} for t in chunk])
+        except HttpStatusError as e:
+            logger.warning(f"CLOB /books returned {e.status} for {len(chunk)} tokens")
+            return {}
+        except Exception as e:
+            logger.warning(f"CLOB /books failed for {len(chunk)} tokens: {e}")
+            return {}
+        books = {}
+        for book in data if isinstance(data, list) else []:
+            token_id = book.get('asset_id')
+            if token_id:
+                books[token_id] = OrderBook.from_payload(book)
+        return books
+
+    async def iter_books(self, token_ids: Iterable[str]) -> AsyncIterator[Dict[str, OrderBook]]:
+        """按分块完成的先后顺序逐块产出 {token_id: book}，便于边到达边分析。"""
+        sem = asyncio.Semaphore(max(1, settings.BOOK_FETCH_CONCURRENCY))
+
+        async def fetch(chunk):
+            async with sem:
+                return await self._fetch_chunk(chunk)
+
+        for next_chunk in asyncio.as_completed([fetch(c) for c in self._chunks(token_ids)]):
+            yield await next_chunk
+
+    async def fetch_books(self, token_ids: Iterable[str]) -> Dict[str, OrderBook]:
+        books: Dict[str, OrderBook] = {}
+        async for chunk in self.iter_books(token_ids):
+            books.update(chunk)
+        return books
+
+    async def fetch_book(self, token_id: str) -> Optional[OrderBook]:
+        return (await self.fetch_books([token_id])).get(token_id)
+
+book_fetcher = BookFetcher()
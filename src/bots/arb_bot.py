@@ -1,7 +1,11 @@
 from .base_bot import BaseBot
 from src.config import settings
+from src.features import FeatureRecord
+from .batch import CandidateBatch
 
 class ArbBot(BaseBot):
+    depth_levels = 3 # look deeper
+
     def __init__(self):
         super().__init__(
             name="Arb-V1",
@@ -12,19 +16,24 @@ class ArbBot(BaseBot):
             }
         )
 
-    async def analyze(self, market: dict, ob_bids: list) -> dict:
-        if not ob_bids: return {"action": "skip"}
+    async def analyze(self, market: dict, features: FeatureRecord) -> dict:
+        if not features: return {"action": "skip"}
         
-        bids = ob_bids[:3] # look deeper
-        best_bid = float(bids[0].price)
+        best_bid = features.best_bid
         
         if not (self.params["min_price"] <= best_bid <= self.params["max_price"]):
             return {"action": "skip"}
             
-        total_depth = sum(float(b.size) * float(b.price) for b in bids)
+        total_depth = features.depth[self.depth_levels]
         if total_depth < (settings.ORDER_AMOUNT_USD * self.params["depth_multiplier"]):
             return {"action": "skip"}
             
+        return self.buy_signal(market, best_bid)
+
+    def evaluate_batch(self, batch: CandidateBatch):
+        return self._entry_mask(batch)
+
+    def buy_signal(self, market: dict, best_bid: float) -> dict:
         # Try to bid slightly higher to grab
         return {
             "action": "buy",
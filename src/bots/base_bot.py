@@ -2,21 +2,29 @@ from abc import ABC, abstractmethod
 import asyncio
 from loguru import logger
 import uuid
-from typing import Dict, Any
+import numpy as np
+from typing import Dict, Any, Optional
 
 from src.config import settings
-from src import db
+from src.trade_writer import trade_writer
+from src.features import FeatureRecord
+from .batch import CandidateBatch
 
 class BaseBot(ABC):
+    # Order book levels summed for the liquidity check (computed once by FeaturePipeline)
+    depth_levels = 2
+
     def __init__(self, name: str, params: dict):
         self.name = name
         self.params = params
         self.active_positions = {}
 
     @abstractmethod
-    async def analyze(self, market: Dict, ob_bids: list) -> Dict[str, Any]:
+    async def analyze(self, market: Dict, features: FeatureRecord) -> Dict[str, Any]:
         """
         Analyze a market and return a signal.
+        Features (best bid, depth per level, momentum, ...) are computed once
+        per market per tick by FeaturePipeline and shared by all bots.
         Expected return format:
         {
             "action": "buy" | "skip",
@@ -27,8 +35,43 @@ class BaseBot(ABC):
         """
         pass
 
-    async def execute(self, market: Dict, signal: Dict, clob_client):
-        """Execute the trade based on PAPER_MODE."""
+    def evaluate_batch(self, batch: CandidateBatch) -> Optional[np.ndarray]:
+        """
+        Vectorized counterpart of analyze(): return a boolean mask over the
+        batch marking the candidates this bot would buy, or None if the bot
+        only supports per-market analyze().
+        """
+        return None
+
+    def batch_signal(self, batch: CandidateBatch, idx: int) -> Dict[str, Any]:
+        """Build the buy signal for a candidate selected by evaluate_batch()."""
+        return self.buy_signal(batch.markets[idx], float(batch.best_bid[idx]))
+
+    @abstractmethod
+    def buy_signal(self, market: Dict, best_bid: float) -> Dict[str, Any]:
+        """Build the buy signal for a market at the given best bid."""
+        pass
+
+    def _entry_mask(self, batch: CandidateBatch) -> np.ndarray:
+        """Shared price band + liquidity depth checks as one vectorized mask."""
+        bb = batch.best_bid
+        min_depth = settings.ORDER_AMOUNT_USD * self.params["depth_multiplier"]
+        return (
+            (bb >= self.params["min_price"]) &
+            (bb <= self.params["max_price"]) &
+            (batch.depth[self.depth_levels] >= min_depth)
+        )
+
+    async def execute(self, market: Dict, signal: Dict, execution):
+        """
+        Execute the trade based on PAPER_MODE.
+        Live orders go through the ExecutionEngine's OrderGateway: signing runs
+        off the event loop and orders from the same tick are posted as one batch.
+        Placed orders are tracked as entries, so fills get a take-profit and
+        they count towards the coordinator's position limits.
+        Trades are logged through the write-behind TradeWriter, so the scan
+        never waits on a SQLite commit.
+        """
         token_id = market.get('token_id')
         target_price = signal.get("target_price")
         if not target_price: return
@@ -44,8 +87,16 @@ class BaseBot(ABC):
             order_id = f"paper_{uuid.uuid4().hex[:8]}"
             logger.info(f"[{self.name}] PAPER TRADE: Bought {size:.2f} shares of {market.get('question')[:30]} at {target_price:.3f}")
             
-            # Log to DB
-            trade_id = db.log_trade(
+            # Track the position right away (position limits), the trade id arrives once logged
+            position = {
+                "token_id": token_id,
+                "category": market.get('category'),
+                "entry_price": target_price,
+                "shares": size,
+                "market": market.get('question')
+            }
+            self.active_positions[order_id] = position
+            logged = trade_writer.log_trade(
                 bot_name=self.name,
                 market_id=token_id,
                 market_question=market.get('question'),
@@ -59,12 +110,7 @@ class BaseBot(ABC):
                 venue=venue,
                 mode=mode
             )
-            self.active_positions[trade_id] = {
-                "token_id": token_id,
-                "entry_price": target_price,
-                "shares": size,
-                "market": market.get('question')
-            }
+            self._track_when_logged(logged, position)
         else:
             # LIVE execution via CLOB
             from py_clob_client.clob_types import OrderArgs, OrderType
@@ -73,16 +119,15 @@ class BaseBot(ABC):
                     price=target_price,
                     size=round(size, 2),
                     side="BUY",
-                    token_id=token_id,
-                    order_type=OrderType.GTC
+                    token_id=token_id
                 )
-                signed_order = clob_client.create_order(order_args)
-                resp = await clob_client.post_order(signed_order)
+                resp = await execution.orders.place(order_args, OrderType.GTC)
                 
                 if resp and resp.get("success"):
                     order_id = resp.get("orderID")
                     logger.success(f"[{self.name}] LIVE TRADE PLACED: {order_id}")
-                    db.log_trade(
+                    execution.track_entry(order_id, market, round(size, 2), target_price, bot=self.name)
+                    logged = trade_writer.log_trade(
                         bot_name=self.name,
                         market_id=token_id,
                         market_question=market.get('question'),
@@ -96,5 +141,20 @@ class BaseBot(ABC):
                         venue=venue,
                         mode=mode
                     )
+                    self._track_when_logged(logged)
             except Exception as e:
                 logger.error(f"[{self.name}] Order placement failed: {e}")
+
+    def _track_when_logged(self, logged: asyncio.Future, position: Optional[Dict] = None):
+        """Attach the trade id to the position once the TradeWriter has committed it."""
+        def done(future: asyncio.Future):
+            if future.cancelled(): return
+            if future.exception() is not None:
+                logger.error(f"[{self.name}] Trade log failed: {future.exception()}")
+                # Never resolvable without a trade row: stop counting it as open
+                for key in [k for k, p in self.active_positions.items() if p is position]:
+                    self.active_positions.pop(key, None)
+                return
+            if position is not None:
+                position["trade_id"] = future.result()
+        logged.add_done_callback(done)
@@ -0,0 +1,34 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+from src.features import FeatureRecord
+
+class CandidateBatch:
+    """
+    一批候选市场特征的列式视图，供 Bot 做向量化筛选：
+    - best_bid: 最优买价
+    - depth[n]: 买方前 n 档名义金额 (FeaturePipeline 计算过的档位)
+    - momentum: oneDayPriceChange (缺失为 NaN)
+    - spread / hours_to_expiry: 缺失为 NaN
+    markets / features 与数组下标一一对应。
+    """
+    def __init__(self, pairs: List[Tuple[Dict, FeatureRecord]]):
+        self.markets = [m for m, _ in pairs]
+        self.features = [f for _, f in pairs]
+        count = len(pairs)
+        self.best_bid = _column(self.features, "best_bid", count)
+        self.spread = _column(self.features, "spread", count)
+        self.momentum = _column(self.features, "momentum", count)
+        self.hours_to_expiry = _column(self.features, "hours_to_expiry", count)
+        levels = self.features[0].depth.keys() if self.features else ()
+        self.depth: Dict[int, np.ndarray] = {
+            n: np.fromiter((f.depth[n] for f in self.features), dtype=np.float64, count=count)
+            for n in levels
+        }
+
+    def __len__(self) -> int:
+        return len(self.markets)
+
+def _column(records: List[FeatureRecord], name: str, count: int) -> np.ndarray:
+    values = (getattr(r, name) for r in records)
+    return np.fromiter((np.nan if v is None else v for v in values), dtype=np.float64, count=count)
@@ -1,5 +1,7 @@
 from .base_bot import BaseBot
 from src.config import settings
+from src.features import FeatureRecord
+from .batch import CandidateBatch
 
 class SniperBot(BaseBot):
     def __init__(self):
@@ -13,23 +15,29 @@ class SniperBot(BaseBot):
             }
         )
 
-    async def analyze(self, market: dict, ob_bids: list) -> dict:
-        if not ob_bids: return {"action": "skip"}
+    async def analyze(self, market: dict, features: FeatureRecord) -> dict:
+        if not features: return {"action": "skip"}
         
-        bids = ob_bids[:2]
-        best_bid = float(bids[0].price)
+        best_bid = features.best_bid
         
         if not (self.params["min_price"] <= best_bid <= self.params["max_price"]):
             return {"action": "skip", "reasoning": f"Price {best_bid} out of range"}
             
-        total_depth = sum(float(b.size) * float(b.price) for b in bids)
+        total_depth = features.depth[self.depth_levels]
         if total_depth < (settings.ORDER_AMOUNT_USD * self.params["depth_multiplier"]):
             return {"action": "skip", "reasoning": "Low liquidity"}
             
-        price_change = market.get('oneDayPriceChange', 0)
-        if price_change is not None and float(price_change) < -self.params["max_drop"]:
+        price_change = features.momentum
+        if price_change is not None and price_change < -self.params["max_drop"]:
             return {"action": "skip", "reasoning": f"Price drop {price_change} < -{self.params['max_drop']}"}
             
+        return self.buy_signal(market, best_bid)
+
+    def evaluate_batch(self, batch: CandidateBatch):
+        # NaN momentum (missing) passes, matching the None check in analyze()
+        return self._entry_mask(batch) & ~(batch.momentum < -self.params["max_drop"])
+
+    def buy_signal(self, market: dict, best_bid: float) -> dict:
         return {
             "action": "buy",
             "confidence": best_bid,
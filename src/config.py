@@ -28,6 +28,42 @@ class Settings(BaseSettings):
     MAX_PRICE_DROP_TOLERANCE: float = 0.02                 # 最大跌幅容忍度 (防止接飞刀)
     LIQUIDITY_DEPTH_MULTIPLIER: int = 5                    # 流动性要求 (订单簿深度必须是下注额的 X 倍)
 
+    # === 网络与并发 ===
+    CLOB_HOST: str = "https://clob.polymarket.com"        # CLOB API 地址
+    HTTP_POOL_SIZE: int = 20                               # 共享 HTTP 会话的最大连接数 (Keep-Alive 连接池)
+    HTTP_TIMEOUT_SECONDS: float = 10.0                     # 单次 HTTP 请求超时 (秒)
+    GAMMA_PAGE_CONCURRENCY: int = 8                        # Gamma /events 分页并发拉取数
+    BOOK_FETCH_CONCURRENCY: int = 16                       # 订单簿批量请求的并发数
+    BOOK_BATCH_SIZE: int = 50                              # 单次 POST /books 请求包含的 token 数上限
+    BOOK_CACHE_TTL_SECONDS: float = 1.0                    # 订单簿缓存默认 TTL (秒)，同一秒内各组件共享同一快照
+    BOOK_CACHE_POSITION_TTL_SECONDS: float = 0.5           # 持仓 token 的订单簿缓存 TTL (秒)
+    BOOK_CACHE_MAX_SIZE: int = 5000                        # 订单簿缓存最大 token 数 (LRU 淘汰)
+    SCHED_MIN_INTERVAL_SECONDS: float = 1.5               # 最热 token 的订单簿刷新间隔 (秒)
+    SCHED_MAX_INTERVAL_SECONDS: float = 180.0              # 最冷 token 的订单簿刷新间隔 (秒)
+    SCHED_IN_BAND_INTERVAL_SECONDS: float = 2.0            # 价格位于 Bot 进场区间内的 token 刷新间隔上限 (秒)
+    SCHED_BOOK_REQUESTS_PER_SECOND: float = 5.0            # 全局订单簿请求预算 (次/秒)
+    SCHED_BAND_DISTANCE: float = 0.05                      # 价格距 Bot 进场区间多远以内开始升温
+    SCHED_MOVE_DECAY_SECONDS: float = 120.0                # 价格变动后的“活跃”热度衰减时长 (秒)
+    CLOB_WS_MARKET_URL: str = "wss://ws-subscriptions-clob.polymarket.com/ws/market"  # 行情 WebSocket 地址
+    CLOB_WS_USER_URL: str = "wss://ws-subscriptions-clob.polymarket.com/ws/user"  # 用户 WebSocket 地址 (成交/订单推送)
+    ORDER_RECONCILE_SECONDS: float = 30.0                  # 用户推送在线时 REST 订单对账间隔 (秒)
+    CLOB_WS_RECONNECT_SECONDS: float = 3.0                 # WebSocket 断线重连间隔 (秒)
+    UNIVERSE_FULL_REFRESH_SECONDS: int = 300               # 未变化的市场最长多久强制重新评估一次 (秒)
+    UNIVERSE_LOOKAHEAD_MINUTES: float = 30.0               # 额外拉取窗口外即将进入的市场 (分钟)，用于精确安排唤醒
+    SCAN_INTERVAL_SECONDS: float = 15.0                    # Gamma 全量扫描间隔 (秒)；其间按窗口变化时刻精确唤醒
+    SHARD_WORKERS: int = 0                                 # 分片扫描 worker 进程数 (按 token 哈希分片)；<= 1 为单进程模式
+    ORDER_SIGNING_WORKERS: int = 4                         # 订单签名线程池大小 (create_order 为同步 ECDSA 签名)
+    ORDER_BATCH_WINDOW_SECONDS: float = 0.02               # 下单合并窗口 (秒)，窗口内的订单合并为一次批量提交
+    ORDER_BATCH_MAX: int = 15                              # 单次 POST /orders 最多包含的订单数
+    ORDER_TIMEOUT_SECONDS: float = 900.0                   # 入场挂单超时未成交自动撤单 (秒)
+    ORDER_CANCEL_RETRY_SECONDS: float = 10.0               # 撤单失败 / 未被撤销时重试间隔 (秒)
+    JOURNAL_COMPACT_EVERY: int = 500                       # 状态日志累计多少条后压缩为 bot_state.json 快照
+    JOURNAL_COMPACT_SECONDS: float = 30.0                  # 有未压缩日志时最长多久压缩一次 (秒)
+    TRADE_WRITE_BATCH_SIZE: int = 200                      # 交易写库线程单个事务最多合并的记录数
+    TRADE_WRITE_FLUSH_SECONDS: float = 0.05                # 交易写库合并窗口 (秒)，窗口内的写入合并为一次提交
+    RESOLVE_INTERVAL_SECONDS: float = 300.0                # 模拟盘成交结算检查间隔 (秒)
+    RESOLVE_TOKENS_PER_REQUEST: int = 50                   # 每次 Gamma /markets 请求查询的 token 数
+
     # === 敏感信息 (将从系统 Keyring 获取) ===
     EOA_PRIVATE_KEY: Optional[str] = None
     CLOB_API_KEY: Optional[str] = None
@@ -1,11 +1,60 @@
 import sqlite3
 import json
 import time
+import threading
 from pathlib import Path
 from loguru import logger
 
 DB_PATH = Path("arena.db")
 
+# 每个连接打开时执行一次的 PRAGMA：
+# WAL 让 Dashboard 的读与引擎的写互不阻塞；WAL 下 synchronous=NORMAL 仍保证崩溃一致性
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",    # 16 MB 页缓存
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000"     # 写锁冲突时等待 5 秒而不是立即报 database is locked
+)
+STATEMENT_CACHE_SIZE = 256         # 每个连接缓存的预编译语句数
+
+class ConnectionManager:
+    """
+    SQLite 连接管理：每个线程一个长连接 (threading.local)，首次使用时打开并设置 PRAGMA，
+    之后 log_trade / get_bot_config 等调用不再重复建立连接；
+    连接内置的语句缓存使同一 SQL 只编译一次。
+    用法不变：with get_conn() as conn 在退出时提交 (异常时回滚)，连接本身保持打开。
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, cached_statements=STATEMENT_CACHE_SIZE)
+            conn.row_factory = sqlite3.Row
+            for pragma in SQLITE_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+_connections = ConnectionManager(DB_PATH)
+
 def init_db():
     with get_conn() as conn:
         conn.execute('''
@@ -30,6 +79,60 @@ def init_db():
             )
         ''')
         
+        # 排行榜边界小时与 Dashboard 最近成交列表走索引 (含 pnl，边界查询无需回表)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_trades_bot_created ON trades (bot_name, created_at, outcome, pnl)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_trades_created ON trades (created_at)')
+        # 结算任务只扫描未结算的成交
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_trades_unresolved ON trades (market_id) WHERE outcome IS NULL')
+
+        # 按 Bot 按小时的汇总 (小时取成交的 created_at)，由触发器随 trades 的插入 / 结算增量维护
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bot_hourly_stats (
+                bot_name TEXT,
+                hour TEXT,
+                trades INTEGER DEFAULT 0,
+                resolved INTEGER DEFAULT 0,
+                wins INTEGER DEFAULT 0,
+                pnl REAL DEFAULT 0,
+                PRIMARY KEY (bot_name, hour)
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trades_rollup_insert AFTER INSERT ON trades
+            BEGIN
+                INSERT INTO bot_hourly_stats (bot_name, hour, trades, resolved, wins, pnl)
+                VALUES (
+                    NEW.bot_name, strftime('%Y-%m-%d %H:00:00', NEW.created_at), 1,
+                    NEW.outcome IS NOT NULL, COALESCE(NEW.outcome = 'win', 0), COALESCE(NEW.pnl, 0)
+                )
+                ON CONFLICT(bot_name, hour) DO UPDATE SET
+                    trades = trades + 1,
+                    resolved = resolved + excluded.resolved,
+                    wins = wins + excluded.wins,
+                    pnl = pnl + excluded.pnl;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trades_rollup_resolve AFTER UPDATE OF outcome, pnl ON trades
+            BEGIN
+                UPDATE bot_hourly_stats SET
+                    resolved = resolved - (OLD.outcome IS NOT NULL) + (NEW.outcome IS NOT NULL),
+                    wins = wins - COALESCE(OLD.outcome = 'win', 0) + COALESCE(NEW.outcome = 'win', 0),
+                    pnl = pnl - COALESCE(OLD.pnl, 0) + COALESCE(NEW.pnl, 0)
+                WHERE bot_name = NEW.bot_name AND hour = strftime('%Y-%m-%d %H:00:00', NEW.created_at);
+            END
+        ''')
+        # 升级到带汇总表的版本时，用已有成交一次性回填
+        if conn.execute('SELECT 1 FROM bot_hourly_stats LIMIT 1').fetchone() is None:
+            conn.execute('''
+                INSERT INTO bot_hourly_stats (bot_name, hour, trades, resolved, wins, pnl)
+                SELECT
+                    bot_name, strftime('%Y-%m-%d %H:00:00', created_at), COUNT(*),
+                    COUNT(outcome), COALESCE(SUM(outcome = 'win'), 0), COALESCE(SUM(pnl), 0)
+                FROM trades
+                GROUP BY bot_name, strftime('%Y-%m-%d %H:00:00', created_at)
+            ''')
+
         conn.execute('''
             CREATE TABLE IF NOT EXISTS bot_learning (
                 bot_name TEXT,
@@ -61,9 +164,10 @@ def init_db():
         ''')
 
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return _connections.get()
+
+def close_connections():
+    _connections.close_all()
 
 def log_trade(bot_name, market_id, market_question, side, amount, entry_price, shares_bought, confidence, reasoning, features, venue, mode):
     with get_conn() as conn:
@@ -81,17 +185,47 @@ def resolve_trade(trade_id, outcome, pnl):
             WHERE id = ?
         ''', (outcome, pnl, trade_id))
 
+def get_unresolved_trades(mode="paper"):
+    with get_conn() as conn:
+        rows = conn.execute('''
+            SELECT id, bot_name, market_id, side, amount, entry_price, shares_bought, created_at
+            FROM trades
+            WHERE outcome IS NULL AND mode = ?
+        ''', (mode,)).fetchall()
+        return [dict(r) for r in rows]
+
 def get_bot_performance(bot_name, hours=24):
+    """
+    最近 hours 小时内开仓且已结算的成交统计。
+    完整小时直接累加 bot_hourly_stats，只有窗口起点所在的那一小时回查 trades (走索引)。
+    """
     with get_conn() as conn:
         row = conn.execute('''
-            SELECT 
-                COUNT(*) as total_trades,
-                SUM(CASE WHEN outcome = 'win' THEN 1 ELSE 0 END) as wins,
-                SUM(pnl) as total_pnl
-            FROM trades 
-            WHERE bot_name = ? AND outcome IS NOT NULL AND created_at >= datetime('now', ?)
-        ''', (bot_name, f'-{hours} hours')).fetchone()
-        
+            WITH bounds AS (
+                SELECT
+                    datetime('now', ?) AS since,
+                    strftime('%Y-%m-%d %H:00:00', 'now', ?) AS since_hour
+            )
+            SELECT
+                SUM(total_trades) AS total_trades,
+                SUM(wins) AS wins,
+                SUM(total_pnl) AS total_pnl
+            FROM (
+                SELECT resolved AS total_trades, wins, pnl AS total_pnl
+                FROM bot_hourly_stats, bounds
+                WHERE bot_name = ? AND hour > bounds.since_hour
+                UNION ALL
+                SELECT
+                    COUNT(*),
+                    SUM(CASE WHEN outcome = 'win' THEN 1 ELSE 0 END),
+                    SUM(pnl)
+                FROM trades, bounds
+                WHERE bot_name = ? AND outcome IS NOT NULL
+                    AND created_at >= bounds.since
+                    AND created_at < datetime(bounds.since_hour, '+1 hour')
+            )
+        ''', (f'-{hours} hours', f'-{hours} hours', bot_name, bot_name)).fetchone()
+
         wins = row["wins"] or 0
         total = row["total_trades"] or 0
         return {
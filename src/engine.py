@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing as mp
+import time
+import numpy as np
+from loguru import logger
+from typing import Awaitable, Callable, Dict, List
+
+from .config import settings
+from .scanner import MarketScanner
+from .market_data import MarketDataFeed
+from .book_cache import book_cache
+from .bots.base_bot import BaseBot
+from .bots.batch import CandidateBatch
+from .features import FeaturePipeline
+from .scheduler import RefreshScheduler
+
+# 买入信号的下游：单进程模式下直接下单，分片模式下发送给协调进程
+SignalSink = Callable[[BaseBot, Dict, Dict], Awaitable[None]]
+
+class ScanEngine:
+    """
+    扫描 + 评估引擎：Gamma 扫描维护候选集合，RefreshScheduler 调度订单簿刷新，
+    FeaturePipeline + CandidateBatch 交给各 Bot 筛选，命中的买入信号交给 dispatch。
+    单进程模式与分片 worker 共用同一实现，区别只在 dispatch。
+    """
+    def __init__(self, scanner: MarketScanner, market_data: MarketDataFeed, bots: List[BaseBot], dispatch: SignalSink):
+        self.scanner = scanner
+        self.market_data = market_data
+        self.bots = bots
+        self.dispatch = dispatch
+        # 特征层：深度只计算所有 Bot 需要的档位并集
+        self.features = FeaturePipeline(bot.depth_levels for bot in self.bots)
+        self.scheduler = RefreshScheduler()
+        self.is_running = False
+
+    async def evaluate_markets(self, markets):
+        """
+        已由行情 WebSocket 同步的 token 直接读取本地订单簿；
+        其余经共享订单簿缓存批量拉取 (TTL + 请求合并，未命中时 POST /books 分块并发)，
+        每个分块一到达就交给所有 Bot 分析，而不是逐个 token 串行等待。
+        """
+        by_token = {m.get('token_id'): m for m in markets if m.get('token_id')}
+        live = {t: self.market_data.get_book(t) for t in by_token if self.market_data.is_live(t)}
+        if live:
+            await self._analyze_books(by_token, live)
+
+        remote = [t for t in by_token if t not in live]
+        async for books in book_cache.iter_books(remote):
+            await self._analyze_books(by_token, books)
+
+    async def _analyze_books(self, by_token, books):
+        """
+        一批订单簿先经 FeaturePipeline 计算一次特征，再组装为 CandidateBatch，
+        每个 Bot 用一次向量化 mask 完成筛选；不支持批量评估的 Bot 回退到逐个市场 analyze。
+        """
+        pairs = self.features.compute_many(by_token, books)
+        if not pairs: return
+        batch = CandidateBatch(pairs)
+
+        for bot in self.bots:
+            mask = bot.evaluate_batch(batch)
+            if mask is None:
+                for market, features in pairs:
+                    signal = await bot.analyze(market, features)
+                    if signal.get("action") == "buy":
+                        await self.dispatch(bot, market, signal)
+                continue
+
+            for idx in np.flatnonzero(mask):
+                await self.dispatch(bot, batch.markets[idx], bot.batch_signal(batch, idx))
+
+    async def run(self):
+        """
+        Gamma 全量扫描按 SCAN_INTERVAL_SECONDS 维护候选集合；
+        订单簿刷新与 Bot 评估由 RefreshScheduler 按每个 token 的热度单独调度，
+        有增量的 token 立即刷新，全局请求受预算限制。
+        """
+        self.is_running = True
+        next_full_scan = 0.0
+        # 作为分片 worker 运行时：协调进程被强杀 (不会设置 stop_event) 后立即退出，不留下孤儿扫描
+        parent = mp.parent_process()
+        while self.is_running:
+            if parent is not None and not parent.is_alive():
+                logger.warning("Parent process exited, stopping scan loop.")
+                break
+            try:
+                now = time.time()
+                self.features.next_tick()
+                if now >= next_full_scan:
+                    changed = await self.scanner.get_eligible_markets()
+                    next_full_scan = now + settings.SCAN_INTERVAL_SECONDS
+                    eligible = [m.token_id for m in self.scanner.universe.eligible()]
+                    self.scheduler.sync(eligible, now)
+                    # 行情 WebSocket 订阅跟随当前窗口内的全部候选
+                    await self.market_data.set_watch("scanner", eligible)
+                else:
+                    # 由窗口变化或 token 到期唤醒：只处理滑过窗口边界的市场，到期的 token 由调度器给出
+                    changed, left = self.scanner.advance_window(now)
+                    if changed:
+                        logger.info(f"{len(changed)} markets entered the expiry window.")
+                    if left:
+                        logger.debug(f"{len(left)} markets left the expiry window.")
+                    for token_id in left:
+                        self.scheduler.untrack(token_id)
+                    for market in changed:
+                        self.scheduler.schedule(market.token_id, now)
+                self.scheduler.bump([m.token_id for m in changed], now)
+
+                due = self.scheduler.pop_due(now)
+                if due:
+                    markets = [e.view for e in (self.scanner.universe.get(t) for t in due) if e is not None]
+                    try:
+                        await self.evaluate_markets(markets)
+                    finally:
+                        # pop_due 已把这些 token 标记为处理中，出错时也必须重新安排，否则再也不会刷新
+                        now = time.time()
+                        for token_id in due:
+                            self.scheduler.reschedule(token_id, self.features.get(token_id), self.entry_bands, now)
+
+                # 睡到下一个 token 到期、下一次全量扫描或下一个市场进入/离开时间窗口，取最早者
+                now = time.time()
+                waits = [next_full_scan - now]
+                for wait in (self.scanner.seconds_until_window_change(now), self.scheduler.next_wakeup(now)):
+                    if wait is not None:
+                        waits.append(wait + 0.05)
+                await asyncio.sleep(max(0.2, min(waits)))
+            except Exception as e:
+                logger.error(f"Scanner loop error: {e}")
+                await asyncio.sleep(10)
+
+    def stop(self):
+        self.is_running = False
+
+    @property
+    def entry_bands(self):
+        return [(bot.params["min_price"], bot.params["max_price"]) for bot in self.bots]
@@ -1,41 +1,72 @@
 import asyncio
+import time
 from loguru import logger
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Set
 from py_clob_client.clob_types import OrderArgs, OrderType
 from .config import settings
+from .book_cache import book_cache
+from .orders import OrderGateway
+from .scheduler import TimerHeap
+from .journal import journal as default_journal
 
 class ExecutionEngine:
-    def __init__(self, clob_client):
+    def __init__(self, clob_client, books=None, orders=None, journal=None):
         self.client = clob_client
-        self.active_entry_orders = {}
-        self.tp_placed_orders = set()
+        self.books = books or book_cache
+        # 签名在线程池中执行，同一 tick 的订单合并批量提交
+        self.orders = orders or OrderGateway(clob_client)
+        # 订单状态由 StateJournal 持有：所有变更经 journal.record() 记日志，重启后可直接恢复
+        self.journal = journal or default_journal
+        self.active_entry_orders = self.journal.state["active_entry_orders"]
+        self.tp_placed_orders = self.journal.state["tp_placed_orders"]
+        # 本方订单登记表 (按 token / bot / role 索引)，止盈单按 token 批量撤销
+        self.registry = self.journal.state["orders"]
+        self._filling: Set[str] = set() # 正在挂止盈的入场单 (推送与轮询可能同时报告同一成交)
+        # 挂单超时：所有订单共用一个截止时间堆，由 expire_orders 单个任务批量撤单
+        self.order_timeouts = TimerHeap()
+        self._timeouts_changed = asyncio.Event()
+        self.is_running = False
 
-    async def process_signal(self, market: Dict, time_class: str):
+    async def process_signal(self, market: Dict, time_class: str, bot: str = None):
         token_id = market.get('token_id')
         target_price = await self._calculate_sniping_price(token_id, time_class)
         if not target_price: return
 
+        size = settings.ORDER_AMOUNT_USD / target_price
         order_id = await self.place_maker_order(
             side="BUY", 
-            size=settings.ORDER_AMOUNT_USD / target_price, 
+            size=size, 
             price=target_price, 
             token_id=token_id
         )
 
         if order_id:
-            self.active_entry_orders[order_id] = {
-                "token_id": token_id,
-                "timestamp": asyncio.get_event_loop().time(),
-                "market_name": market.get('question')
-            }
-            asyncio.create_task(self._monitor_order_timeout(order_id))
+            self.track_entry(order_id, market, size, target_price, bot=bot)
+
+    def track_entry(self, order_id: str, market: Dict, size: float, price: float, bot: str = None):
+        """登记已挂出的入场单：记日志、登记表与超时撤单，之后由推送 / 对账跟踪成交。"""
+        token_id = market.get('token_id')
+        self.journal.record("entry_placed", order_id, {
+            "token_id": token_id,
+            "created_at": time.time(),
+            "market_name": market.get('question'),
+            "category": market.get('category'),
+            "size": round(size, 2),
+            "price": price
+        })
+        self.register_order(order_id, token_id, "entry", bot=bot)
+        self.order_timeouts.add(order_id, time.monotonic() + settings.ORDER_TIMEOUT_SECONDS)
+        self._timeouts_changed.set()
 
     async def _calculate_sniping_price(self, token_id: str, time_class: str) -> Optional[float]:
         try:
-            ob = await self.client.get_order_book(token_id)
-            if not ob.bids: return 0.94
+            book = await self.books.fetch_book(token_id)
+            if not book:
+                # 没有订单簿 (拉取失败或买盘为空) 时不盲目报价
+                logger.warning(f"No order book for {token_id}, skipping entry.")
+                return None
             
-            best_bid = float(ob.bids[0].price)
+            best_bid = book.best_bid
             sniping_price = best_bid + 0.001
             
             if time_class == "A":
@@ -53,8 +84,7 @@ class ExecutionEngine:
             price=0.1, 
             size=round(float(size), 2),
             side="SELL",
-            token_id=token_id,
-            order_type=OrderType.GTC
+            token_id=token_id
         )
 
     async def place_maker_order(self, side: str, size: float, price: float, token_id: str) -> Optional[str]:
@@ -63,11 +93,10 @@ class ExecutionEngine:
                 price=float(price),
                 size=round(float(size), 2),
                 side=side,
-                token_id=token_id,
-                order_type=OrderType.GTC_POST_ONLY
+                token_id=token_id
             )
-            signed_order = self.client.create_order(order_args)
-            resp = await self.client.post_order(signed_order)
+            # GTC + post_only：只做 Maker
+            resp = await self.orders.place(order_args, OrderType.GTC, post_only=True)
             
             if resp and resp.get("success"):
                 return resp.get("orderID")
@@ -78,21 +107,121 @@ class ExecutionEngine:
 
     async def handle_order_fill(self, fill_data: Dict):
         order_id = fill_data.get('order_id')
-        if order_id in self.active_entry_orders and order_id not in self.tp_placed_orders:
+        self.order_timeouts.discard(order_id) # 已成交，不再需要超时撤单
+        if order_id in self.active_entry_orders and order_id not in self.tp_placed_orders and order_id not in self._filling:
             order_info = self.active_entry_orders[order_id]
-            tp_order_id = await self.place_maker_order(
-                side="SELL",
-                size=fill_data.get('size'),
-                price=settings.TAKE_PROFIT_PRICE,
-                token_id=order_info['token_id']
-            )
+            self._filling.add(order_id)
+            try:
+                tp_order_id = await self.place_maker_order(
+                    side="SELL",
+                    size=fill_data.get('size'),
+                    price=settings.TAKE_PROFIT_PRICE,
+                    token_id=order_info['token_id']
+                )
+            finally:
+                self._filling.discard(order_id)
             if tp_order_id:
-                self.tp_placed_orders.add(order_id)
+                self.journal.record("tp_placed", order_id)
+                entry = self.registry.get(order_id) or {}
+                self.register_order(tp_order_id, order_info['token_id'], "tp", bot=entry.get("bot"), entry_order_id=order_id)
+
+    def register_order(self, order_id: str, token_id: str, role: str, bot: str = None, **extra):
+        self.journal.record("order_added", order_id, dict(extra, token_id=token_id, role=role, bot=bot, created_at=time.time()))
+
+    def close_entry(self, order_id: str):
+        """入场单结束 (撤销 / 过期)：移除超时定时器、状态与登记。"""
+        self.order_timeouts.discard(order_id)
+        self.journal.record("entry_closed", order_id)
+        if order_id in self.registry:
+            self.journal.record("order_removed", order_id)
+
+    def release_token(self, token_id: str, roles=("entry", "tp")):
+        """持仓了结后清理该 token 的入场 / 止盈订单记录。"""
+        for order_id in self.registry.find(token_id=token_id):
+            if self.registry.get(order_id).get("role") not in roles: continue
+            if order_id in self.active_entry_orders:
+                self.close_entry(order_id)
+            else:
+                self.journal.record("order_removed", order_id)
 
-    async def _monitor_order_timeout(self, order_id: str):
-        await asyncio.sleep(15 * 60)
-        if order_id in self.active_entry_orders and order_id not in self.tp_placed_orders:
+    async def cancel_orders(self, order_ids: Iterable[str]) -> List[str]:
+        """
+        批量撤单 (一次 DELETE /orders)。
+        撤销成功的入场单关闭 (同时移除超时定时器)，其余订单从登记表中移除。返回成功撤销的 order_id。
+        请求失败或未被撤销的未成交入场单在 ORDER_CANCEL_RETRY_SECONDS 后由超时任务重试。
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        if not order_ids: return []
+        
+        loop = asyncio.get_running_loop()
+        try:
+            # py_clob_client 的 cancel_orders 是同步方法
+            resp = await loop.run_in_executor(None, self.client.cancel_orders, order_ids)
+        except Exception as e:
+            logger.warning(f"Batch cancel of {len(order_ids)} orders failed: {e}")
+            self._retry_cancel(order_ids)
+            return []
+        
+        canceled = list(resp.get("canceled") or []) if isinstance(resp, dict) else []
+        not_canceled = resp.get("not_canceled") if isinstance(resp, dict) else None
+        if not_canceled:
+            logger.warning(f"Orders not canceled: {not_canceled}")
+        for order_id in canceled:
+            if order_id in self.active_entry_orders:
+                self.close_entry(order_id)
+            elif order_id in self.registry:
+                self.journal.record("order_removed", order_id)
+        confirmed = set(canceled)
+        self._retry_cancel([o for o in order_ids if o not in confirmed])
+        return canceled
+
+    def _retry_cancel(self, order_ids: Iterable[str]):
+        """未确认撤销的未成交入场单重新挂上 (短间隔) 超时定时器，避免永远挂在订单簿上。"""
+        retry_at = time.monotonic() + settings.ORDER_CANCEL_RETRY_SECONDS
+        armed = 0
+        for order_id in order_ids:
+            if order_id in self.active_entry_orders and order_id not in self.tp_placed_orders:
+                self.order_timeouts.add(order_id, retry_at)
+                armed += 1
+        if armed:
+            self._timeouts_changed.set()
+
+    def restore_timeouts(self):
+        """重启恢复：为日志中尚未成交的入场单按原下单时间重新安排超时撤单。"""
+        now, mono = time.time(), time.monotonic()
+        for order_id, info in self.active_entry_orders.items():
+            if order_id in self.tp_placed_orders: continue
+            remaining = info.get("created_at", now) + settings.ORDER_TIMEOUT_SECONDS - now
+            self.order_timeouts.add(order_id, mono + max(0.0, remaining))
+        self._timeouts_changed.set()
+
+    async def expire_orders(self):
+        """
+        单个任务处理所有挂单超时 (取代每笔订单一个 sleep 15 分钟的任务)：
+        睡到最早的截止时间 (有新定时器加入时提前唤醒)，把同时到期的订单合并为一次批量撤单。
+        入场单超时前已挂出止盈 (即已成交) 的不撤。
+        """
+        self.is_running = True
+        while self.is_running:
             try:
-                await self.client.cancel_order(order_id)
-                self.active_entry_orders.pop(order_id, None)
-            except: pass
+                deadline = self.order_timeouts.next_deadline()
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                self._timeouts_changed.clear()
+                try:
+                    await asyncio.wait_for(self._timeouts_changed.wait(), timeout)
+                    continue # 定时器集合变化，重新计算最早截止时间
+                except asyncio.TimeoutError:
+                    pass
+                
+                expired = self.order_timeouts.pop_expired(time.monotonic())
+                stale = [o for o in expired if o in self.active_entry_orders and o not in self.tp_placed_orders]
+                if stale:
+                    canceled = await self.cancel_orders(stale)
+                    logger.info(f"Order timeout: canceled {len(canceled)}/{len(stale)} resting entry orders.")
+            except Exception as e:
+                logger.error(f"Order expiry loop error: {e}")
+                await asyncio.sleep(1)
+
+    def stop(self):
+        self.is_running = False
+        self._timeouts_changed.set()
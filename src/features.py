@@ -0,0 +1,89 @@
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+from .orderbook import OrderBook
+
+class FeatureRecord:
+    """
+    单个市场在某一 tick 的特征快照，由 FeaturePipeline 计算一次后交给所有 Bot。
+    depth: {档位数 N: 买方前 N 档名义金额}
+    momentum: oneDayPriceChange (缺失为 None)
+    """
+    __slots__ = ("token_id", "tick", "best_bid", "best_ask", "spread", "depth", "momentum", "hours_to_expiry")
+
+    def __init__(self, token_id: str, tick: int, best_bid: Optional[float], best_ask: Optional[float],
+                 spread: Optional[float], depth: Dict[int, float], momentum: Optional[float],
+                 hours_to_expiry: Optional[float]):
+        self.token_id = token_id
+        self.tick = tick
+        self.best_bid = best_bid
+        self.best_ask = best_ask
+        self.spread = spread
+        self.depth = depth
+        self.momentum = momentum
+        self.hours_to_expiry = hours_to_expiry
+
+    def __bool__(self) -> bool:
+        return self.best_bid is not None
+
+    def __repr__(self) -> str:
+        return f"FeatureRecord({self.token_id!r}, bid={self.best_bid}, depth={self.depth}, mom={self.momentum})"
+
+class FeaturePipeline:
+    """
+    位于 MarketScanner 与 Bots 之间的特征层：
+    每个市场每个 tick 只计算一次 (最优价、各档深度、价差、动量、剩余小时)，
+    深度只计算所有 Bot 声明过的档位的并集，因此新增 Bot 变体不会重复计算同一特征。
+    """
+    def __init__(self, depth_levels: Iterable[int] = (2,)):
+        self.depth_levels = sorted(set(depth_levels))
+        self.tick = 0
+        self._memo: Dict[str, FeatureRecord] = {}
+
+    def next_tick(self) -> int:
+        self.tick += 1
+        self._memo.clear()
+        return self.tick
+
+    def get(self, token_id: str) -> Optional[FeatureRecord]:
+        """本 tick 已计算过的特征 (没有则 None)。"""
+        return self._memo.get(token_id)
+
+    def compute(self, market: Dict, book: OrderBook, now: Optional[float] = None) -> FeatureRecord:
+        token_id = market.get('token_id')
+        record = self._memo.get(token_id)
+        if record is not None:
+            return record
+
+        end_ts = market.get('end_ts')
+        now = now or time.time()
+        record = FeatureRecord(
+            token_id=token_id,
+            tick=self.tick,
+            best_bid=book.best_bid if book is not None else None,
+            best_ask=book.best_ask if book is not None else None,
+            spread=book.spread if book is not None else None,
+            depth={n: book.depth(n) if book is not None else 0.0 for n in self.depth_levels},
+            momentum=_as_float(market.get('oneDayPriceChange')),
+            hours_to_expiry=(end_ts - now) / 3600 if end_ts is not None else None
+        )
+        self._memo[token_id] = record
+        return record
+
+    def compute_many(self, by_token: Dict[str, Dict], books: Dict[str, OrderBook]) -> List[tuple]:
+        """返回 [(market, FeatureRecord)]，只保留有市场记录且买盘非空的 token。"""
+        now = time.time()
+        pairs = []
+        for token_id, book in books.items():
+            market = by_token.get(token_id)
+            if market is None or not book: continue
+            pairs.append((market, self.compute(market, book, now)))
+        return pairs
+
+def _as_float(value) -> Optional[float]:
+    if value is None: return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
@@ -0,0 +1,65 @@
+import re
+from loguru import logger
+from typing import Dict, Optional, Pattern, Tuple
+from .config import settings
+
+def _compile_terms(raw: str) -> Optional[Pattern]:
+    """
+    将逗号分隔的词表编译为单个交替正则 (子串匹配，大小写不敏感)。
+    较长的词排在前面，同一位置优先命中更具体的词。
+    """
+    terms = {t.strip().lower() for t in (raw or "").split(',') if t.strip()}
+    if not terms:
+        return None
+    ordered = sorted(terms, key=lambda t: (-len(t), t))
+    return re.compile("|".join(re.escape(t) for t in ordered))
+
+class MarketFilter:
+    """
+    预编译的市场过滤器：违禁词 (question + description) 与排除分类 (category + tags)。
+    每个市场只做一次正则扫描，不再逐词循环。
+    """
+    def __init__(self, poison_keywords: str, excluded_categories: str):
+        self.key = (poison_keywords, excluded_categories)
+        self.poison = _compile_terms(poison_keywords)
+        self.category = _compile_terms(excluded_categories)
+
+    def poison_hit(self, market: Dict) -> Optional[str]:
+        if self.poison is None: return None
+        content = (str(market.get('question', '')) + " " + str(market.get('description', ''))).lower()
+        match = self.poison.search(content)
+        return match.group(0) if match else None
+
+    def category_hit(self, market: Dict) -> Optional[str]:
+        if self.category is None: return None
+        category = market.get('category') or ""
+        tags = [t.get('label', '') for t in market.get('tags', [])] if isinstance(market.get('tags'), list) else []
+        combined_cat_info = (category + " " + " ".join(tags)).lower()
+        match = self.category.search(combined_cat_info)
+        return match.group(0) if match else None
+
+    def classify(self, market: Dict) -> Optional[Tuple[str, str]]:
+        """
+        返回 ("poison" | "category", 命中的词)；通过过滤则返回 None。
+        违禁词先于分类检查，与原有统计口径一致。
+        """
+        term = self.poison_hit(market)
+        if term is not None:
+            return "poison", term
+        term = self.category_hit(market)
+        if term is not None:
+            return "category", term
+        return None
+
+_cached: Optional[MarketFilter] = None
+
+def get_market_filter() -> MarketFilter:
+    """
+    返回当前配置对应的过滤器；仅在 POISON_KEYWORDS / EXCLUDED_CATEGORIES 变化时重新编译。
+    """
+    global _cached
+    key = (settings.POISON_KEYWORDS, settings.EXCLUDED_CATEGORIES)
+    if _cached is None or _cached.key != key:
+        _cached = MarketFilter(*key)
+        logger.debug("Market filter compiled.")
+    return _cached
@@ -0,0 +1,60 @@
+import asyncio
+import aiohttp
+from loguru import logger
+from typing import Any, Dict, Optional
+from .config import settings
+
+class HttpStatusError(Exception):
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+class HttpClient:
+    """
+    进程内共享的异步 HTTP 层：
+    - 单个 aiohttp 会话 + Keep-Alive 连接池，避免每次请求都重新 TLS 握手
+    - 会话在首次使用时于当前事件循环中惰性创建
+    """
+    def __init__(self, pool_size: int = 20, timeout: float = 10.0):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            async with self._lock:
+                if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit=self.pool_size,
+                        keepalive_timeout=60,
+                        ttl_dns_cache=300
+                    )
+                    self._session = aiohttp.ClientSession(
+                        connector=connector,
+                        timeout=aiohttp.ClientTimeout(total=self.timeout)
+                    )
+        return self._session
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        session = await self.session()
+        async with session.get(url, params=params) as resp:
+            if resp.status != 200:
+                raise HttpStatusError(resp.status, await resp.text())
+            return await resp.json(content_type=None)
+
+    async def post_json(self, url: str, payload: Any) -> Any:
+        session = await self.session()
+        async with session.post(url, json=payload) as resp:
+            if resp.status != 200:
+                raise HttpStatusError(resp.status, await resp.text())
+            return await resp.json(content_type=None)
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logger.debug("HTTP session closed.")
+        self._session = None
+
+http_client = HttpClient(pool_size=settings.HTTP_POOL_SIZE, timeout=settings.HTTP_TIMEOUT_SECONDS)
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from pathlib import Path
+from loguru import logger
+from typing import Any, Dict, Optional
+from .config import settings
+from .order_registry import OrderRegistry
+
+SNAPSHOT_PATH = Path("bot_state.json")
+JOURNAL_PATH = Path("bot_state.journal")
+
+class StateJournal:
+    """
+    订单 / 持仓状态日志 (崩溃恢复用)：
+    - state 中的容器就是 ExecutionEngine / RiskMonitor 直接使用的对象，
+      所有状态转移都经 record() 执行：先修改内存，再向 bot_state.journal 追加一行 JSON
+    - 每 JOURNAL_COMPACT_EVERY 条或 JOURNAL_COMPACT_SECONDS 秒压缩一次：
+      当前状态原子写入快照 bot_state.json (Dashboard 读取的也是它)，然后清空日志
+    - 启动时 load()：读快照 + 重放日志，无需逐个向交易所查询订单
+    所有操作幂等 (覆盖 / 删除)，压缩中途崩溃时重复重放也不会出错。
+    """
+    def __init__(self, snapshot_path: Path = SNAPSHOT_PATH, journal_path: Path = JOURNAL_PATH):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = Path(journal_path)
+        self.state: Dict[str, Any] = {
+            "active_entry_orders": {},   # order_id -> {"token_id", "created_at", "market_name", ...}
+            "tp_placed_orders": set(),   # 已挂出止盈的入场 order_id
+            "active_positions": {},      # token_id -> {"entry_price", "l2_trigger_time"}
+            "orders": OrderRegistry(),   # order_id -> {"token_id", "role", "bot", ...} (entry / tp / exit)
+            "category_counts": {}
+        }
+        self._file = None
+        self._pending = 0
+        self._last_compact = time.monotonic()
+
+    def load(self) -> Dict[str, int]:
+        """从快照 + 日志恢复状态 (原地更新 state 中的容器)，然后打开日志准备追加。"""
+        start = time.perf_counter()
+        if self.snapshot_path.exists():
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                self.state["active_entry_orders"].update(snapshot.get("active_entry_orders") or {})
+                self.state["tp_placed_orders"].update(snapshot.get("tp_placed_orders") or [])
+                self.state["active_positions"].update(snapshot.get("active_positions") or {})
+                self.state["orders"].update(snapshot.get("orders") or {})
+                self.state["category_counts"].update(snapshot.get("category_counts") or {})
+            except Exception as e:
+                logger.error(f"State snapshot unreadable, starting empty: {e}")
+
+        replayed = 0
+        good_offset = 0
+        if self.journal_path.exists():
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"): break # 崩溃时写了一半的最后一行
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(entry["op"], entry["key"], entry.get("value"))
+                    replayed += 1
+                    good_offset += len(line)
+            # 截掉残缺的尾部，否则本次会话的第一条记录会接在半行后面，下次重放时连同之后的记录一起丢失
+            if self.journal_path.stat().st_size > good_offset:
+                logger.warning(f"Truncating torn state journal tail at byte {good_offset}.")
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(good_offset)
+
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+        self._pending = replayed
+        counts = {
+            "orders": len(self.state["active_entry_orders"]),
+            "positions": len(self.state["active_positions"]),
+            "registry": len(self.state["orders"]),
+            "replayed": replayed
+        }
+        logger.info(f"State recovered in {(time.perf_counter() - start) * 1000:.1f} ms: {counts}")
+        return counts
+
+    def _apply(self, op: str, key: str, value: Optional[Dict] = None):
+        if op == "entry_placed":
+            self.state["active_entry_orders"][key] = value
+        elif op == "entry_closed":
+            self.state["active_entry_orders"].pop(key, None)
+            self.state["tp_placed_orders"].discard(key)
+        elif op == "tp_placed":
+            self.state["tp_placed_orders"].add(key)
+        elif op == "tp_cleared":
+            self.state["tp_placed_orders"].discard(key)
+        elif op == "position_opened":
+            self.state["active_positions"][key] = value
+        elif op == "position_closed":
+            self.state["active_positions"].pop(key, None)
+        elif op == "order_added":
+            self.state["orders"].add(key, value)
+        elif op == "order_removed":
+            self.state["orders"].remove(key)
+        else:
+            logger.warning(f"Unknown journal op: {op}")
+
+    def record(self, op: str, key: str, value: Optional[Dict] = None):
+        self._apply(op, key, value)
+        if self._file is None: return # 未 load()，只保留内存状态
+        self._file.write(json.dumps({"op": op, "key": key, "value": value, "ts": time.time()}) + "\n")
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= settings.JOURNAL_COMPACT_EVERY:
+            self.compact()
+
+    def maybe_compact(self):
+        """周期性调用：有未压缩的日志且距上次压缩超过 JOURNAL_COMPACT_SECONDS 时压缩。"""
+        if self._pending and time.monotonic() - self._last_compact >= settings.JOURNAL_COMPACT_SECONDS:
+            self.compact()
+
+    def compact(self):
+        if self._file is None: return
+        snapshot = {
+            "active_entry_orders": self.state["active_entry_orders"],
+            "tp_placed_orders": sorted(self.state["tp_placed_orders"]),
+            "active_positions": self.state["active_positions"],
+            "orders": self.state["orders"].records,
+            "category_counts": self.state["category_counts"]
+        }
+        tmp_path = self.snapshot_path.with_suffix(".json.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # 快照已落盘，日志可以清空
+            self._file.seek(0)
+            self._file.truncate()
+            self._pending = 0
+            self._last_compact = time.monotonic()
+        except Exception as e:
+            logger.error(f"State compaction failed: {e}")
+
+    def close(self):
+        if self._file is None: return
+        self.compact()
+        self._file.close()
+        self._file = None
+
+journal = StateJournal()
@@ -51,32 +51,18 @@ def get_learned_bias(bot_name, features, prior_yes=0.5):
     yes_bias = 1.0 / (1.0 + math.exp(-log_odds))
     return max(0.05, min(0.95, yes_bias))
 
+def outcome_increments(features, side, won):
+    """每个特征的 (feature_key, wins 增量, losses 增量)；以 YES 方向计胜负。"""
+    yes_won = won if side == "yes" else not won
+    return [(feat, 1, 0) if yes_won else (feat, 0, 1) for feat in features]
+
 def record_outcome(bot_name, features, side, won):
     with db.get_conn() as conn:
-        for feat in features:
-            if side == "yes":
-                if won:
-                    conn.execute('''
-                        INSERT INTO bot_learning (bot_name, feature_key, wins, losses)
-                        VALUES (?, ?, 1, 0)
-                        ON CONFLICT(bot_name, feature_key) DO UPDATE SET wins=wins+1, updated_at=CURRENT_TIMESTAMP
-                    ''', (bot_name, feat))
-                else:
-                    conn.execute('''
-                        INSERT INTO bot_learning (bot_name, feature_key, wins, losses)
-                        VALUES (?, ?, 0, 1)
-                        ON CONFLICT(bot_name, feature_key) DO UPDATE SET losses=losses+1, updated_at=CURRENT_TIMESTAMP
-                    ''', (bot_name, feat))
-            else:
-                if won:
-                    conn.execute('''
-                        INSERT INTO bot_learning (bot_name, feature_key, wins, losses)
-                        VALUES (?, ?, 0, 1)
-                        ON CONFLICT(bot_name, feature_key) DO UPDATE SET losses=losses+1, updated_at=CURRENT_TIMESTAMP
-                    ''', (bot_name, feat))
-                else:
-                    conn.execute('''
-                        INSERT INTO bot_learning (bot_name, feature_key, wins, losses)
-                        VALUES (?, ?, 1, 0)
-                        ON CONFLICT(bot_name, feature_key) DO UPDATE SET wins=wins+1, updated_at=CURRENT_TIMESTAMP
-                    ''', (bot_name, feat))
+        conn.executemany('''
+            INSERT INTO bot_learning (bot_name, feature_key, wins, losses)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(bot_name, feature_key) DO UPDATE SET
+                wins = wins + excluded.wins,
+                losses = losses + excluded.losses,
+                updated_at = CURRENT_TIMESTAMP
+        ''', [(bot_name, feat, w, l) for feat, w, l in outcome_increments(features, side, won)])
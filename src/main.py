@@ -1,6 +1,7 @@
 import asyncio
 import sys
 import signal
+from typing import Dict, Optional, Set, Tuple
 from loguru import logger
 from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import ApiCreds
@@ -8,13 +9,22 @@ from py_clob_client.clob_types import ApiCreds
 from .config import settings
 from .scanner import MarketScanner
 from .monitor import RiskMonitor
+from .execution import ExecutionEngine
+from .market_data import MarketDataFeed
+from .user_feed import UserFeed
+from .http_client import http_client
+from .journal import journal
+from .trade_writer import trade_writer
+from .resolver import TradeResolver
 from . import db
 from .bots.sniper_bot import SniperBot
 from .bots.trend_bot import TrendBot
 from .bots.arb_bot import ArbBot
+from .engine import ScanEngine
+from .sharding import ShardPool
 
 import os
-import requests
+
 
 class PolyArbBot:
     def __init__(self):
@@ -25,7 +35,7 @@ class PolyArbBot:
         # 记录日志到文件以便 Dashboard 读取
         import datetime
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_name = f"logs/bot_{timestamp}.log"
+        log_name = self.log_name = f"logs/bot_{timestamp}.log"
         
         # 移除默认 logger 并添加带强制刷新的 sink
         logger.remove() 
@@ -40,8 +50,6 @@ class PolyArbBot:
         
         logger.info(f"Engine Sparked. Tracking: {log_name}")
             
-        host = "https://clob.polymarket.com"
-        
         # 构造新版 SDK 所需的 ApiCreds 对象
         creds = ApiCreds(
             api_key=settings.CLOB_API_KEY,
@@ -50,15 +58,23 @@ class PolyArbBot:
         )
         
         self.clob_client = ClobClient(
-            host=host,
+            host=settings.CLOB_HOST,
             key=settings.EOA_PRIVATE_KEY,
             chain_id=settings.CHAIN_ID,
             creds=creds,
             signature_type=int(settings.SIGNATURE_TYPE) if settings.SIGNATURE_TYPE else 0,
             funder=settings.FUNDER_ADDRESS if settings.FUNDER_ADDRESS else None
         )
-        self.scanner = MarketScanner(self.clob_client)
+        self.market_data = MarketDataFeed()
+        # 先从快照 + 日志恢复订单与持仓状态，再构建依赖它的执行与风控组件
+        journal.load()
+        self.execution = ExecutionEngine(self.clob_client)
+        self.user_feed = UserFeed(self.execution)
+        self.risk_monitor = RiskMonitor(self.clob_client, self.execution, market_data=self.market_data, user_feed=self.user_feed)
         self.is_running = False
+        # 下单在途的预占 (bot, token_id) -> 分类，计入持仓上限；下单任务本身并发执行
+        self._placing: Dict[Tuple[str, str], Optional[str]] = {}
+        self._placements: Set[asyncio.Task] = set()
         
         # Initialize bots
         self.bots = [
@@ -74,12 +90,32 @@ class PolyArbBot:
                 bot.params.update(db_config)
             else:
                 db.save_bot_config(bot.name, bot.__class__.__name__, 1, bot.params)
+        self.resolver = TradeResolver(self.bots)
+        
+        # 分片模式：扫描与 Bot 评估分散到 worker 进程，本进程作为协调者只负责下单、持仓限制与写库
+        self.shards = None
+        self.engine = None
+        if settings.SHARD_WORKERS > 1:
+            self.shards = ShardPool(settings.SHARD_WORKERS, self.bots, self.log_name)
+        else:
+            self.engine = ScanEngine(MarketScanner(self.clob_client), self.market_data, self.bots, self.dispatch)
 
     async def start(self):
         self.is_running = True
         logger.success(f"PolyMarket Arena Started in {'PAPER' if settings.PAPER_MODE else 'LIVE'} mode")
+        if self.shards is not None:
+            self.shards.start()
+            scan_task = self.shard_loop()
+        else:
+            scan_task = self.engine.run()
+        self.execution.restore_timeouts()
         tasks = [
-            asyncio.create_task(self.scanner_loop())
+            asyncio.create_task(scan_task),
+            asyncio.create_task(self.market_data.run()),
+            asyncio.create_task(self.user_feed.run()),
+            asyncio.create_task(self.risk_monitor.watch_portfolio()),
+            asyncio.create_task(self.execution.expire_orders()),
+            asyncio.create_task(self.resolver.run())
         ]
         try:
             await asyncio.gather(*tasks)
@@ -88,45 +124,100 @@ class PolyArbBot:
         finally:
             await self.shutdown()
 
-    async def fetch_ob(self, token_id):
+    def open_positions(self) -> Dict[Tuple[Optional[str], str], Optional[str]]:
+        """
+        协调进程已开出的持仓 (bot, token_id) -> 分类，同一 token 上不同 Bot 的持仓分别计数：
+        模拟盘为各 Bot 的 active_positions，实盘为挂单中 / 已成交未了结的入场单 (Bot 取自订单登记表)，
+        以及风控正在监控、但没有对应入场单的持仓 (如重启恢复的)；下单在途的预占同样计入。
+        """
+        positions: Dict[Tuple[Optional[str], str], Optional[str]] = dict(self._placing)
+        for bot in self.bots:
+            for pos in bot.active_positions.values():
+                positions[(bot.name, pos["token_id"])] = pos.get("category")
+        for order_id, info in self.execution.active_entry_orders.items():
+            record = self.execution.registry.get(order_id) or {}
+            positions[(record.get("bot"), info["token_id"])] = info.get("category")
+        held = {token_id for _, token_id in positions}
+        for token_id in self.risk_monitor.active_positions:
+            if token_id not in held:
+                positions[(None, token_id)] = None
+        return positions
+
+    def bot_holds(self, bot, token_id: str) -> bool:
+        """Bot 在该 token 上已有持仓 (模拟盘)、入场 / 止盈订单 (实盘登记表) 或正在下单。"""
+        if (bot.name, token_id) in self._placing:
+            return True
+        if any(pos["token_id"] == token_id for pos in bot.active_positions.values()):
+            return True
+        return bool(self.execution.registry.find(token_id=token_id, bot=bot.name))
+
+    async def dispatch(self, bot, market, signal):
+        """
+        所有买入信号的唯一出口 (分片模式下只在协调进程执行)：
+        去重与全局 / 分类持仓上限检查及预占都同步完成，随后下单作为任务并发执行并立即返回，
+        同一 tick 的订单因此一起进入 OrderGateway 的合并窗口，而不是逐笔等待签名与提交。
+        """
+        question = market.get('question', '')[:40]
+        # 进场区间内的 token 会被频繁重新评估，已持有或已挂单的不再重复下单
+        if self.bot_holds(bot, market.get('token_id')):
+            logger.debug(f"[{bot.name}] SKIP {question}: already holding or resting an order")
+            return
+        positions = self.open_positions()
+        if len(positions) >= settings.GLOBAL_MAX_POSITIONS:
+            logger.debug(f"[{bot.name}] SKIP {question}: GLOBAL_MAX_POSITIONS reached")
+            return
+        category = market.get('category')
+        if category and category != "Unknown":
+            in_category = sum(1 for c in positions.values() if c == category)
+            if in_category >= settings.MAX_ACTIVE_POSITIONS_PER_CATEGORY:
+                logger.debug(f"[{bot.name}] SKIP {question}: MAX_ACTIVE_POSITIONS_PER_CATEGORY reached for {category}")
+                return
+        key = (bot.name, market.get('token_id'))
+        self._placing[key] = category
+        task = asyncio.create_task(self._place(bot, market, signal, key))
+        self._placements.add(task)
+        task.add_done_callback(self._placements.discard)
+
+    async def _place(self, bot, market, signal, key: Tuple[str, str]):
         try:
-            url = f"https://clob.polymarket.com/book?token_id={token_id}"
-            resp = await asyncio.get_event_loop().run_in_executor(None, requests.get, url)
-            if resp.status_code == 200:
-                data = resp.json()
-                class MockBid:
-                    def __init__(self, d):
-                        self.price = d['price']
-                        self.size = d['size']
-                return [MockBid(b) for b in data.get('bids', [])]
-            return []
-        except Exception:
-            return []
+            await bot.execute(market, signal, self.execution)
+        except Exception as e:
+            logger.error(f"[{bot.name}] Execution failed: {e}")
+        finally:
+            # 下单结束后由 Bot 持仓 / 入场单记录接替预占
+            self._placing.pop(key, None)
 
-    async def scanner_loop(self):
-        while self.is_running:
+    async def shard_loop(self):
+        """消费各分片 worker 发来的买入信号，逐条分发 (下单并发执行)。"""
+        by_name = {bot.name: bot for bot in self.bots}
+        async for shard, bot_name, market, signal in self.shards.signals():
+            bot = by_name.get(bot_name)
+            if bot is None: continue
             try:
-                markets = await self.scanner.get_eligible_markets()
-                for market in markets:
-                    token_id = market.get('token_id')
-                    if not token_id: continue
-                    
-                    bids = await self.fetch_ob(token_id)
-                    if not bids: continue
-                    
-                    for bot in self.bots:
-                        signal = await bot.analyze(market, bids)
-                        if signal.get("action") == "buy":
-                            await bot.execute(market, signal, self.clob_client)
-                            
-                await asyncio.sleep(15) # Faster scanning loop like Arena
+                await self.dispatch(bot, market, signal)
             except Exception as e:
-                logger.error(f"Scanner loop error: {e}")
-                await asyncio.sleep(10)
+                logger.error(f"Shard {shard} signal from {bot_name} failed: {e}")
 
     async def shutdown(self):
         self.is_running = False
         logger.warning("Shutting down...")
+        self.risk_monitor.is_running = False
+        self.execution.stop()
+        self.resolver.stop()
+        if self.engine is not None:
+            self.engine.stop()
+        if self.shards is not None:
+            self.shards.stop()
+        await self.market_data.stop()
+        await self.user_feed.stop()
+        await http_client.close()
+        if self._placements:
+            # 等待在途下单完成 (其响应仍需登记)，再关闭签名线程池
+            await asyncio.wait(self._placements, timeout=5)
+        self.execution.orders.close()
+        journal.close()
+        trade_writer.stop()
+        db.close_connections()
 
 if __name__ == "__main__":
     bot = PolyArbBot()
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import websockets
+from loguru import logger
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from .config import settings
+from .book_cache import book_cache
+from .orderbook import OrderBook
+
+class LocalBook:
+    """
+    单个 token 的本地订单簿副本 (价格 -> 数量)，由快照 + 增量维护。
+    """
+    __slots__ = ("token_id", "bids", "asks", "timestamp", "hash", "synced")
+
+    def __init__(self, token_id: str):
+        self.token_id = token_id
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.timestamp = 0
+        self.hash = None
+        self.synced = False
+
+    def apply_snapshot(self, bids: List[Dict], asks: List[Dict], timestamp: int = 0, book_hash: str = None):
+        self.bids = {float(l['price']): float(l['size']) for l in bids or [] if float(l['size']) > 0}
+        self.asks = {float(l['price']): float(l['size']) for l in asks or [] if float(l['size']) > 0}
+        self.timestamp = timestamp
+        self.hash = book_hash
+        self.synced = True
+
+    def apply_order_book(self, ob: OrderBook):
+        self.bids = {p: s for p, s in zip(ob.bid_px.tolist(), ob.bid_sz.tolist()) if s > 0}
+        self.asks = {p: s for p, s in zip(ob.ask_px.tolist(), ob.ask_sz.tolist()) if s > 0}
+        self.timestamp = ob.timestamp
+        self.hash = None
+        self.synced = True
+
+    def apply_change(self, side: str, price: float, size: float):
+        levels = self.bids if side.upper() == "BUY" else self.asks
+        if size > 0:
+            levels[price] = size
+        else:
+            levels.pop(price, None)
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return max(self.bids) if self.bids else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return min(self.asks) if self.asks else None
+
+    def is_crossed(self) -> bool:
+        bid, ask = self.best_bid, self.best_ask
+        return bid is not None and ask is not None and bid >= ask
+
+    def depth(self, levels: int) -> float:
+        """买方前 N 档的名义金额 (price * size)。"""
+        return sum(p * self.bids[p] for p in sorted(self.bids, reverse=True)[:levels])
+
+    def to_book(self) -> OrderBook:
+        """当前状态的 OrderBook 快照 (与 REST 拉取结果同一类型)。"""
+        return OrderBook.from_maps(self.token_id, self.bids, self.asks, self.timestamp)
+
+BookListener = Callable[[str, LocalBook], Awaitable[None]]
+
+class MarketDataFeed:
+    """
+    CLOB 行情 WebSocket (market channel) 订阅与本地订单簿维护：
+    - 按来源分组登记关注的 token (如 scanner / positions)，取并集订阅
+    - 应用 book 快照与 price_change 增量
+    - 出现缺口 (无快照的增量、盘口交叉) 或重连时，用 REST 批量快照重新同步；早于快照的增量直接丢弃
+    - 每次更新后回调监听者 (如 RiskMonitor)，读取最优价/深度不再需要网络往返
+    """
+    def __init__(self, url: str = None, books=None):
+        self.url = url or settings.CLOB_WS_MARKET_URL
+        self.books = books or book_cache
+        self.local_books: Dict[str, LocalBook] = {}
+        self.watch_groups: Dict[str, Set[str]] = {}
+        self.listeners: List[BookListener] = []
+        self.is_running = False
+        self._ws = None
+        self._subscribed: Set[str] = set()
+        self._resyncing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set() # 在途的重新同步任务 (事件循环只持有弱引用)
+
+    # === 订阅管理 ===
+    @property
+    def watched(self) -> Set[str]:
+        tokens = set()
+        for group in self.watch_groups.values():
+            tokens |= group
+        return tokens
+
+    async def set_watch(self, group: str, token_ids: Iterable[str]):
+        self.watch_groups[group] = {t for t in token_ids if t}
+        await self._sync_subscriptions()
+
+    async def watch(self, group: str, token_ids: Iterable[str]):
+        self.watch_groups.setdefault(group, set()).update(t for t in token_ids if t)
+        await self._sync_subscriptions()
+
+    async def unwatch(self, group: str, token_ids: Iterable[str]):
+        self.watch_groups.get(group, set()).difference_update(token_ids)
+        await self._sync_subscriptions()
+
+    def add_listener(self, listener: BookListener):
+        self.listeners.append(listener)
+
+    async def _sync_subscriptions(self):
+        watched = self.watched
+        added = watched - self._subscribed
+        removed = self._subscribed - watched
+        for token_id in removed:
+            self.local_books.pop(token_id, None)
+        if self._ws is None:
+            return
+        try:
+            if added:
+                await self._ws.send(json.dumps({"assets_ids": sorted(added), "operation": "subscribe"}))
+                self._schedule_resync(added)
+            if removed:
+                await self._ws.send(json.dumps({"assets_ids": sorted(removed), "operation": "unsubscribe"}))
+            self._subscribed = watched
+        except Exception as e:
+            logger.warning(f"Market feed subscription update failed: {e}")
+
+    # === 对外读取 ===
+    def is_live(self, token_id: str) -> bool:
+        book = self.local_books.get(token_id)
+        return book is not None and book.synced
+
+    def get_book(self, token_id: str) -> Optional[OrderBook]:
+        book = self.local_books.get(token_id)
+        return book.to_book() if book is not None and book.synced else None
+
+    def best_bid(self, token_id: str) -> Optional[float]:
+        book = self.local_books.get(token_id)
+        return book.best_bid if book is not None and book.synced else None
+
+    def best_ask(self, token_id: str) -> Optional[float]:
+        book = self.local_books.get(token_id)
+        return book.best_ask if book is not None and book.synced else None
+
+    def depth(self, token_id: str, levels: int) -> Optional[float]:
+        book = self.local_books.get(token_id)
+        return book.depth(levels) if book is not None and book.synced else None
+
+    # === 连接主循环 ===
+    async def run(self):
+        self.is_running = True
+        while self.is_running:
+            if not self.watched:
+                await asyncio.sleep(1) # 没有关注的 token 时不建立连接
+                continue
+            try:
+                async with websockets.connect(self.url, ping_interval=20, max_size=None) as ws:
+                    self._ws = ws
+                    # 重连后所有本地簿都视为不可信，等待服务端快照或 REST 重新同步
+                    for book in self.local_books.values():
+                        book.synced = False
+                    watched = self.watched
+                    await ws.send(json.dumps({"assets_ids": sorted(watched), "type": "market"}))
+                    self._subscribed = watched
+                    logger.info(f"Market feed connected ({len(watched)} tokens).")
+                    self._schedule_resync(watched)
+
+                    heartbeat = asyncio.create_task(self._heartbeat(ws))
+                    try:
+                        async for raw in ws:
+                            await self._on_message(raw)
+                    finally:
+                        heartbeat.cancel()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"Market feed disconnected: {e}")
+            finally:
+                self._ws = None
+                self._subscribed = set()
+            if self.is_running:
+                await asyncio.sleep(settings.CLOB_WS_RECONNECT_SECONDS)
+
+    async def stop(self):
+        self.is_running = False
+        for task in list(self._tasks):
+            task.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _heartbeat(self, ws):
+        while True:
+            await asyncio.sleep(10)
+            await ws.send("PING")
+
+    async def _on_message(self, raw):
+        if raw == "PONG": return
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return
+        events = payload if isinstance(payload, list) else [payload]
+        for event in events:
+            event_type = event.get("event_type")
+            if event_type == "book":
+                await self._on_snapshot(event)
+            elif event_type == "price_change":
+                await self._on_price_change(event)
+
+    async def _on_snapshot(self, event: Dict):
+        token_id = event.get("asset_id")
+        if token_id not in self.watched: return
+        book = self.local_books.setdefault(token_id, LocalBook(token_id))
+        timestamp = int(event.get("timestamp") or 0)
+        if book.synced and timestamp < book.timestamp: return # 过期快照
+        book.apply_snapshot(event.get("bids"), event.get("asks"), timestamp, event.get("hash"))
+        await self._notify(token_id, book)
+
+    async def _on_price_change(self, event: Dict):
+        timestamp = int(event.get("timestamp") or 0)
+        # 新版消息: price_changes 中每条自带 asset_id；旧版: 顶层 asset_id + changes
+        if "price_changes" in event:
+            changes = event.get("price_changes") or []
+        else:
+            changes = [dict(c, asset_id=event.get("asset_id")) for c in event.get("changes") or []]
+
+        touched: Dict[str, LocalBook] = {}
+        for change in changes:
+            token_id = change.get("asset_id")
+            if token_id not in self.watched: continue
+            book = self.local_books.get(token_id)
+            if book is None or not book.synced:
+                # 缺口：没有可用的基准快照，丢弃增量并重新同步
+                self._schedule_resync([token_id])
+                continue
+            if timestamp < book.timestamp: continue # 早于当前快照的过期增量
+            book.apply_change(change.get("side", ""), float(change["price"]), float(change["size"]))
+            book.hash = change.get("hash", event.get("hash"))
+            touched[token_id] = book
+
+        for token_id, book in touched.items():
+            book.timestamp = timestamp
+            if book.is_crossed():
+                book.synced = False
+                self._schedule_resync([token_id])
+                continue
+            await self._notify(token_id, book)
+
+    async def _notify(self, token_id: str, book: LocalBook):
+        for listener in self.listeners:
+            try:
+                await listener(token_id, book)
+            except Exception as e:
+                logger.error(f"Market feed listener error: {e}")
+
+    # === REST 重新同步 ===
+    def _schedule_resync(self, token_ids: Iterable[str]):
+        pending = [t for t in token_ids if t not in self._resyncing]
+        if not pending: return
+        self._resyncing.update(pending)
+        for token_id in pending:
+            book = self.local_books.get(token_id)
+            if book is not None:
+                book.synced = False
+        task = asyncio.create_task(self._resync(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Market feed resync task failed: {task.exception()}")
+
+    async def _resync(self, token_ids: List[str]):
+        try:
+            snapshots = await self.books.fetch_books(token_ids, max_age=0)
+            for token_id, snap in snapshots.items():
+                if token_id not in self.watched: continue
+                book = self.local_books.setdefault(token_id, LocalBook(token_id))
+                if book.synced and snap.timestamp < book.timestamp: continue # 已被更新的 WS 快照覆盖
+                book.apply_order_book(snap)
+                await self._notify(token_id, book)
+        except Exception as e:
+            logger.warning(f"Market feed resync failed: {e}")
+        finally:
+            self._resyncing.difference_update(token_ids)
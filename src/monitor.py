@@ -3,16 +3,38 @@ import json
 import time
 from datetime import datetime, timedelta
 from loguru import logger
-from typing import List, Dict
+from typing import List, Dict, Set
 from .config import settings
+from .book_cache import book_cache
+from .triggers import TriggerIndex
 
 class RiskMonitor:
-    def __init__(self, clob_client, execution_engine):
+    def __init__(self, clob_client, execution_engine, books=None, market_data=None, user_feed=None):
         self.client = clob_client
         self.execution = execution_engine
+        self.books = books or book_cache
         
-        # 活跃持仓监控: {token_id: {"entry_price": float, "l2_start_time": float}}
-        self.active_positions = {}
+        # 行情 WebSocket 本地订单簿 (可选)：持仓 token 的盘口推送直接触发止损检查
+        self.market_data = market_data
+        if self.market_data is not None:
+            self.market_data.add_listener(self._on_book_update)
+        
+        # 用户 WebSocket (可选)：成交推送直接触发挂止盈，REST 轮询降为低频对账
+        self.user_feed = user_feed
+        if self.user_feed is not None:
+            self.user_feed.add_listener(self._on_fill)
+        self._last_reconcile = 0.0
+        self._partial_fills: Dict[str, float] = {} # order_id -> 上次对账时的 size_matched
+        
+        # 活跃持仓监控: {token_id: {"entry_price": float, "l2_trigger_time": float}}
+        # 与订单状态一起由 StateJournal 持有并记日志
+        self.journal = execution_engine.journal
+        self.active_positions = self.journal.state["active_positions"]
+        # 止损触发价索引：盘口更新只处理真正被穿越的触发价；L2 确认计时中的持仓单独登记
+        self.triggers = TriggerIndex()
+        self.l2_pending: Set[str] = set()
+        # 买价处于 L1 之下的持仓：状态持续期间该 token 不应有止盈单 (撤单失败或之后新挂的都会被再次撤销)
+        self.l1_active: Set[str] = set()
         self.is_running = False
 
         # 系统熔断记录: [timestamp1, timestamp2...]
@@ -20,18 +42,33 @@ class RiskMonitor:
 
     async def watch_portfolio(self):
         """
-        全天候 24h 风控监控 (采用高频轮询替代不稳定的 Websocket)
+        全天候 24h 风控监控：
+        止损优先由行情推送驱动 (_on_book_update)，此轮询负责订单状态、L2 确认计时，
+        以及尚未在本地订单簿中同步的持仓 (REST 批量兜底)。
         """
         self.is_running = True
+        # 重启恢复：日志中的持仓重新挂上短 TTL 与行情订阅 (L2 计时从头开始)
+        for token_id, pos in list(self.active_positions.items()):
+            pos["l2_trigger_time"] = None
+            await self._track_position(token_id)
+        
         while self.is_running:
             try:
+                self.journal.maybe_compact()
+                
                 # 检查熔断状态
                 if await self._check_circuit_breaker():
                     await asyncio.sleep(60)
                     continue
 
-                await self._poll_orders()
+                # 用户推送在线时订单状态只需低频 REST 对账，断线时退回每轮轮询
+                reconcile_every = settings.ORDER_RECONCILE_SECONDS if self.user_feed is not None and self.user_feed.is_connected else 0
+                if time.time() - self._last_reconcile >= reconcile_every:
+                    self._last_reconcile = time.time()
+                    await self._poll_orders()
                 await self._poll_active_positions()
+                await self._enforce_l1()
+                await self._check_l2_confirmations()
 
             except Exception as e:
                 logger.error(f"Monitor Polling Error: {e}")
@@ -39,49 +76,144 @@ class RiskMonitor:
             await asyncio.sleep(2)  # 每 2 秒轮询一次
 
     async def _poll_orders(self):
-        active_orders = list(self.execution.active_entry_orders.keys())
-        for order_id in active_orders:
-            if order_id in self.execution.tp_placed_orders:
+        """
+        REST 批量对账：一次 (SDK 内部分页) 拉取账户全部挂单，与 active_entry_orders 做差：
+        - 仍在挂单中：size_matched 增长则记为部分成交
+        - 已不在挂单中：订单离开了订单簿，仅对这些订单单独查询终态，MATCHED -> 成交，CANCELED -> 撤单
+        请求数与挂单数量无关，只与本轮发生状态变化的订单数有关。
+        已挂止盈的入场单不再参与对账，改为对账其止盈单：止盈成交 -> 持仓了结，止盈被撤 -> 移除登记；
+        已不在挂单中的平仓单从订单登记表中移除。
+        """
+        pending = [o for o in self.execution.active_entry_orders if o not in self.execution.tp_placed_orders]
+        take_profits = self.execution.registry.find(role="tp")
+        exits = self.execution.registry.find(role="exit")
+        if not pending and not take_profits and not exits: return
+        
+        loop = asyncio.get_running_loop()
+        try:
+            # py_clob_client 的 get_orders 是同步方法 (内部按 next_cursor 翻页)
+            open_orders = await loop.run_in_executor(None, self.client.get_orders)
+        except Exception as e:
+            logger.warning(f"Open order reconciliation failed: {e}")
+            return
+        open_by_id = {o.get("id"): o for o in open_orders or [] if isinstance(o, dict)}
+        for order_id in exits:
+            if order_id not in open_by_id:
+                self.journal.record("order_removed", order_id)
+
+        tp_fills, tp_cancels = [], []
+        for order_id in take_profits:
+            if order_id in open_by_id: continue
+            status = ((await self._final_status(order_id)).get("status") or "").upper()
+            if status in ("MATCHED", "FILLED"):
+                tp_fills.append(order_id)
+            elif status in ("CANCELED", "CANCELLED", "EXPIRED"):
+                tp_cancels.append(order_id)
+        
+        fills, cancels, partials = [], [], 0
+        for order_id in pending:
+            info = self.execution.active_entry_orders.get(order_id)
+            if info is None: continue
+            order = open_by_id.get(order_id)
+            if order is None:
+                # 离开订单簿：查询一次终态 (新下的单可能尚未出现在列表中，终态仍为 LIVE 时忽略)
+                order = await self._final_status(order_id)
+                status = (order.get("status") or "").upper()
+                if status in ("MATCHED", "FILLED"):
+                    fills.append(self._fill_from_order(order_id, info, order))
+                elif status in ("CANCELED", "CANCELLED", "EXPIRED"):
+                    cancels.append(order_id)
                 continue
             
-            try:
-                # py_clob_client 0.34.6 中的 get_order 是同步方法
-                order_info = self.client.get_order(order_id)
-                status = order_info.get("status") if isinstance(order_info, dict) else getattr(order_info, "status", None)
-                
-                if status in ["MATCHED", "FILLED"]:
-                    token_id = self.execution.active_entry_orders[order_id]["token_id"]
-                    size = getattr(order_info, "original_size", getattr(order_info, "size", 0)) if not isinstance(order_info, dict) else order_info.get("original_size", order_info.get("size", 0))
-                    price = getattr(order_info, "price", 0) if not isinstance(order_info, dict) else order_info.get("price", 0)
-                    
-                    fill_data = {
-                        "order_id": order_id,
-                        "size": float(size) if size else 0.0,
-                        "price": float(price) if price else 0.0,
-                        "token_id": token_id
-                    }
-                    await self.execution.handle_order_fill(fill_data)
-                    self._add_to_monitoring(fill_data)
-            except Exception as e:
-                pass # 忽略网络偶发报错，避免日志轰炸
-            
-            await asyncio.sleep(0.1)  # 避免触发 API 限流
+            matched = float(order.get("size_matched") or 0)
+            original = float(order.get("original_size") or info.get("size") or 0)
+            if original and matched >= original:
+                fills.append(self._fill_from_order(order_id, info, order))
+            elif matched > self._partial_fills.get(order_id, 0.0):
+                self._partial_fills[order_id] = matched
+                partials += 1
+                logger.info(f"Entry order {order_id} partially filled: {matched}/{original}")
+        
+        for order_id in cancels:
+            self.execution.close_entry(order_id)
+            self._partial_fills.pop(order_id, None)
+        for fill_data in fills:
+            self._partial_fills.pop(fill_data["order_id"], None)
+            await self._on_fill(fill_data)
+        for order_id in tp_cancels:
+            if order_id in self.execution.registry:
+                self.journal.record("order_removed", order_id)
+        for order_id in tp_fills:
+            record = self.execution.registry.get(order_id)
+            if record is None: continue
+            logger.success(f"Take-profit {order_id} filled, position {record['token_id']} closed.")
+            await self._close_position(record["token_id"])
+        
+        if fills or cancels or partials or tp_fills or tp_cancels:
+            logger.info(
+                f"Order reconciliation: {len(fills)} filled, {len(cancels)} canceled, {partials} partial, "
+                f"{len(tp_fills)} TP filled, {len(tp_cancels)} TP canceled ({len(pending)} tracked, {len(open_by_id)} open)."
+            )
+
+    async def _final_status(self, order_id: str) -> Dict:
+        """单独查询已离开订单簿的订单；查询失败时返回空 dict (下一轮再对账)。"""
+        loop = asyncio.get_running_loop()
+        try:
+            order = await loop.run_in_executor(None, self.client.get_order, order_id)
+        except Exception:
+            return {}
+        return order if isinstance(order, dict) else {}
+
+    def _fill_from_order(self, order_id: str, info: Dict, order: Dict) -> Dict:
+        size = order.get("size_matched") or order.get("original_size") or info.get("size") or 0
+        price = order.get("price") or info.get("price") or 0
+        return {
+            "order_id": order_id,
+            "size": float(size),
+            "price": float(price),
+            "token_id": info["token_id"]
+        }
+
+    async def _on_fill(self, fill_data: Dict):
+        """入场单成交 (用户推送或 REST 对账)：挂止盈并纳入持仓监控。"""
+        await self.execution.handle_order_fill(fill_data)
+        await self._add_to_monitoring(fill_data)
+        if fill_data.get("token_id") in self.l1_active:
+            # 同一 token 上另一笔入场在 L1 预警期间成交：刚挂出的止盈同样撤销
+            await self._cancel_tp_orders(fill_data["token_id"])
 
     async def _poll_active_positions(self):
         active_tokens = list(self.active_positions.keys())
+        if not active_tokens: return
+        
+        # 已由行情推送同步的 token 直接读本地订单簿，其余的一次批量 REST 拉取
+        feed = self.market_data
+        live = [t for t in active_tokens if feed is not None and feed.is_live(t)]
+        stale = [t for t in active_tokens if t not in live]
+        books = await self.books.fetch_books(stale) if stale else {}
+        
         for token_id in active_tokens:
+            book = feed.get_book(token_id) if token_id in live else books.get(token_id)
             try:
-                ob = self.client.get_order_book(token_id)
-                if ob and hasattr(ob, "bids") and ob.bids:
+                if book:
                     book_data = {
                         "token_id": token_id,
-                        "bids": [[ob.bids[0].price, getattr(ob.bids[0], "size", 0)]]
+                        "bids": [[book.best_bid, book.best_bid_size]]
                     }
                     await self._check_stop_loss(book_data)
             except Exception as e:
                 pass
-            
-            await asyncio.sleep(0.1)
+
+    async def _on_book_update(self, token_id: str, book):
+        """行情推送回调：持仓 token 的盘口一变化就检查止损，无需等待下一轮轮询。"""
+        if token_id not in self.active_positions: return
+        best_bid = book.best_bid
+        if best_bid is None: return
+        if len(self.stop_loss_history) >= settings.CB_MAX_HARD_STOPS: return # 熔断期间与轮询一致，暂停止损检查
+        await self._check_stop_loss({
+            "token_id": token_id,
+            "bids": [[best_bid, book.bids.get(best_bid, 0)]]
+        })
 
     async def _check_circuit_breaker(self) -> bool:
         """
@@ -101,47 +233,91 @@ class RiskMonitor:
         return False
 
     async def _cancel_tp_orders(self, token_id: str):
-        for order_id in list(self.execution.tp_placed_orders):
-            try:
-                # py_clob_client uses cancel()
-                self.client.cancel(order_id)
-                self.execution.tp_placed_orders.remove(order_id)
-            except Exception as e:
-                logger.warning(f"Error cancelling TP order: {e}")
+        """
+        只撤销该 token 的止盈单 (订单登记表按 token + role 查找)，一次批量撤单请求。
+        入场单仍保留在 tp_placed_orders 中：成交已处理，对账时不会重新挂出止盈。
+        """
+        tp_orders = self.execution.registry.find(token_id=token_id, role="tp")
+        if not tp_orders: return
+        canceled = await self.execution.cancel_orders(tp_orders)
+        logger.warning(f"Canceled {len(canceled)}/{len(tp_orders)} TP orders for {token_id}")
 
-    def _add_to_monitoring(self, payload: Dict):
+    async def _add_to_monitoring(self, payload: Dict):
         token_id = payload.get("token_id")
         if token_id not in self.active_positions:
-            self.active_positions[token_id] = {
+            position = {
                 "entry_price": float(payload.get("price")),
                 "l2_trigger_time": None
             }
+            # 可选的按持仓 / 按 Bot 触发价，缺省使用全局配置
+            for field in ("l1_trigger", "l2_trigger"):
+                if payload.get(field) is not None:
+                    position[field] = float(payload[field])
+            self.journal.record("position_opened", token_id, position)
+            await self._track_position(token_id)
+
+    async def _track_position(self, token_id: str):
+        pos = self.active_positions[token_id]
+        self.triggers.add(token_id, token_id, {
+            "L1": pos.get("l1_trigger", settings.STOP_LOSS_L1_TRIGGER),
+            "L2": pos.get("l2_trigger", settings.STOP_LOSS_L2_TRIGGER)
+        })
+        # 持仓 token 的缓存订单簿使用更短的 TTL
+        if hasattr(self.books, "set_ttl"):
+            self.books.set_ttl(token_id, settings.BOOK_CACHE_POSITION_TTL_SECONDS)
+        if self.market_data is not None:
+            await self.market_data.watch("positions", [token_id])
 
     async def _check_stop_loss(self, book_data: Dict):
         token_id = book_data.get("token_id")
         if token_id not in self.active_positions: return
 
-        # 获取当前最优买价
+        # 获取当前最优买价，只处理本次被穿越的触发价
         best_bid = float(book_data.get("bids")[0][0]) if book_data.get("bids") else 0
-        pos = self.active_positions[token_id]
-
-        # L1: 预警线 (0.91) - 撤销止盈
-        if best_bid < settings.STOP_LOSS_L1_TRIGGER:
-            await self._cancel_tp_orders(token_id)
-            
-            # L2: 硬止损 (0.85) - 确认期 15s
-            if best_bid < settings.STOP_LOSS_L2_TRIGGER:
-                if not pos["l2_trigger_time"]:
+        for kind, key, crossed_down in self.triggers.update(token_id, best_bid):
+            pos = self.active_positions.get(key)
+            if pos is None: continue
+            if kind == "L1":
+                # L1: 预警线 (0.91) - 跌破时撤销止盈，回升前保持预警状态
+                if crossed_down:
+                    self.l1_active.add(key)
+                    await self._cancel_tp_orders(key)
+                else:
+                    self.l1_active.discard(key)
+            elif kind == "L2":
+                # L2: 硬止损 (0.85) - 跌破开始 15s 确认计时，回升则重置
+                if crossed_down:
                     pos["l2_trigger_time"] = time.time()
-                    logger.warning(f"L2 TIMER STARTED for {token_id} (Bid: {best_bid})")
-                elif time.time() - pos["l2_trigger_time"] > settings.STOP_LOSS_L2_CONFIRM_SECONDS:
-                    # 触发硬止损，并记录熔断点
-                    await self._force_exit(token_id, "L2_HARD_STOP")
-                    self.stop_loss_history.append(time.time())
-            else:
-                pos["l2_trigger_time"] = None # 价格回升，重置计时器
-        else:
-            pos["l2_trigger_time"] = None
+                    self.l2_pending.add(key)
+                    logger.warning(f"L2 TIMER STARTED for {key} (Bid: {best_bid})")
+                else:
+                    pos["l2_trigger_time"] = None
+                    self.l2_pending.discard(key)
+        
+        if token_id in self.l2_pending:
+            await self._check_l2_confirmations([token_id])
+
+    async def _enforce_l1(self):
+        """每轮重试：L1 预警中的 token 若仍有止盈单 (撤单失败 / not_canceled / 之后新挂的) 则再次撤销。"""
+        for token_id in list(self.l1_active):
+            if token_id not in self.active_positions:
+                self.l1_active.discard(token_id)
+            elif self.execution.registry.find(token_id=token_id, role="tp"):
+                await self._cancel_tp_orders(token_id)
+
+    async def _check_l2_confirmations(self, keys=None):
+        """确认期已过且价格仍在 L2 之下的持仓执行硬止损 (只遍历计时中的持仓)。"""
+        now = time.time()
+        for key in list(keys if keys is not None else self.l2_pending):
+            pos = self.active_positions.get(key)
+            if pos is None:
+                self.l2_pending.discard(key)
+                continue
+            started = pos.get("l2_trigger_time")
+            if started and now - started > settings.STOP_LOSS_L2_CONFIRM_SECONDS:
+                # 触发硬止损，并记录熔断点
+                await self._force_exit(key, "L2_HARD_STOP")
+                self.stop_loss_history.append(time.time())
 
     async def _force_exit(self, token_id: str, reason: str):
         try:
@@ -150,10 +326,24 @@ class RiskMonitor:
             balance = float(balance_resp.get("balance", 0))
             if balance > 0:
                 logger.critical(f"EXECUTING HARD STOP: {token_id} | {reason}")
+                # 先撤掉仍挂着的止盈单 (否则卖出数量被占用)，再市价平仓
+                await self._cancel_tp_orders(token_id)
                 order_args = self.execution.create_market_sell_order(token_id, balance)
-                signed = self.client.create_order(order_args)
-                await self.client.post_order(signed)
-                
-                self.active_positions.pop(token_id, None)
+                resp = await self.execution.orders.place(order_args)
+                if resp and resp.get("orderID"):
+                    self.execution.register_order(resp["orderID"], token_id, "exit")
+                await self._close_position(token_id)
         except Exception as e:
             logger.critical(f"Exit Failed: {e}")
+
+    async def _close_position(self, token_id: str):
+        """持仓了结 (止盈成交或强制平仓)：清理入场 / 止盈订单记录、持仓状态、触发价、缓存 TTL 与行情订阅。"""
+        self.execution.release_token(token_id)
+        self.journal.record("position_closed", token_id)
+        self.triggers.remove(token_id, token_id)
+        self.l2_pending.discard(token_id)
+        self.l1_active.discard(token_id)
+        if hasattr(self.books, "set_ttl"):
+            self.books.set_ttl(token_id, None)
+        if self.market_data is not None:
+            await self.market_data.unwatch("positions", [token_id])
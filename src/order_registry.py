@@ -0,0 +1,59 @@
+from typing import Dict, List, Optional, Set
+
+ROLES = ("entry", "tp", "exit")
+
+class OrderRegistry:
+    """
+    本方订单登记表：order_id -> {"token_id", "role", "bot", ...}，
+    另按 token / bot / role 维护倒排索引，find() 用集合求交集，
+    例如 L1 预警只取出该 token 的止盈单一次批量撤销。
+    由 StateJournal 持有，通过 order_added / order_removed 日志变更，重启后可恢复。
+    """
+    def __init__(self):
+        self.records: Dict[str, Dict] = {}
+        self.by_token: Dict[str, Set[str]] = {}
+        self.by_bot: Dict[str, Set[str]] = {}
+        self.by_role: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self.records
+
+    def get(self, order_id: str) -> Optional[Dict]:
+        return self.records.get(order_id)
+
+    def add(self, order_id: str, record: Dict):
+        self.remove(order_id)
+        self.records[order_id] = record
+        for index, field in ((self.by_token, "token_id"), (self.by_bot, "bot"), (self.by_role, "role")):
+            value = record.get(field)
+            if value is not None:
+                index.setdefault(value, set()).add(order_id)
+
+    def remove(self, order_id: str) -> Optional[Dict]:
+        record = self.records.pop(order_id, None)
+        if record is None: return None
+        for index, field in ((self.by_token, "token_id"), (self.by_bot, "bot"), (self.by_role, "role")):
+            value = record.get(field)
+            ids = index.get(value)
+            if ids is not None:
+                ids.discard(order_id)
+                if not ids:
+                    index.pop(value, None)
+        return record
+
+    def find(self, token_id: str = None, bot: str = None, role: str = None) -> List[str]:
+        """按条件筛选 order_id (条件之间为且)；不给条件时返回全部。"""
+        matches: Optional[Set[str]] = None
+        for index, value in ((self.by_token, token_id), (self.by_bot, bot), (self.by_role, role)):
+            if value is None: continue
+            ids = index.get(value, set())
+            matches = set(ids) if matches is None else matches & ids
+            if not matches: return []
+        return list(self.records if matches is None else matches)
+
+    def update(self, records: Dict[str, Dict]):
+        for order_id, record in records.items():
+            self.add(order_id, record)
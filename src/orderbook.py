@@ -0,0 +1,83 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+_EMPTY = np.zeros(0, dtype=np.float64)
+
+class OrderBook:
+    """
+    紧凑的订单簿表示：买/卖各一组并行的 float64 数组 (价格、数量)，解析一次。
+    bids 按价格降序、asks 按价格升序排列 (REST 原始返回顺序不保证最优价在前)，
+    并预先计算买方累计名义金额，深度查询为 O(1)。
+    len(book) 为买方档位数，因此空买盘的订单簿为假值。
+    """
+    __slots__ = ("token_id", "bid_px", "bid_sz", "ask_px", "ask_sz", "bid_cum_notional", "timestamp")
+
+    def __init__(self, token_id: str, bid_px: np.ndarray, bid_sz: np.ndarray,
+                 ask_px: np.ndarray, ask_sz: np.ndarray, timestamp: int = 0):
+        bid_order = np.argsort(-bid_px, kind="stable")
+        ask_order = np.argsort(ask_px, kind="stable")
+        self.token_id = token_id
+        self.bid_px = bid_px[bid_order]
+        self.bid_sz = bid_sz[bid_order]
+        self.ask_px = ask_px[ask_order]
+        self.ask_sz = ask_sz[ask_order]
+        self.bid_cum_notional = np.cumsum(self.bid_px * self.bid_sz)
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_levels(cls, token_id: str, bids: Optional[List[Dict]], asks: Optional[List[Dict]], timestamp=0) -> "OrderBook":
+        """由 REST / WebSocket 的 [{"price": "0.95", "size": "100"}, ...] 构建。"""
+        bid_px, bid_sz = _parse_levels(bids)
+        ask_px, ask_sz = _parse_levels(asks)
+        return cls(token_id, bid_px, bid_sz, ask_px, ask_sz, int(timestamp or 0))
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> "OrderBook":
+        return cls.from_levels(payload.get("asset_id"), payload.get("bids"), payload.get("asks"), payload.get("timestamp"))
+
+    @classmethod
+    def from_maps(cls, token_id: str, bids: Dict[float, float], asks: Dict[float, float], timestamp: int = 0) -> "OrderBook":
+        """由本地订单簿的 {price: size} 映射构建。"""
+        return cls(
+            token_id,
+            np.fromiter(bids.keys(), dtype=np.float64, count=len(bids)),
+            np.fromiter(bids.values(), dtype=np.float64, count=len(bids)),
+            np.fromiter(asks.keys(), dtype=np.float64, count=len(asks)),
+            np.fromiter(asks.values(), dtype=np.float64, count=len(asks)),
+            timestamp
+        )
+
+    def __len__(self) -> int:
+        return len(self.bid_px)
+
+    def __repr__(self) -> str:
+        return f"OrderBook({self.token_id!r}, bid={self.best_bid}, ask={self.best_ask}, levels={len(self.bid_px)}/{len(self.ask_px)})"
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return float(self.bid_px[0]) if len(self.bid_px) else None
+
+    @property
+    def best_bid_size(self) -> float:
+        return float(self.bid_sz[0]) if len(self.bid_sz) else 0.0
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return float(self.ask_px[0]) if len(self.ask_px) else None
+
+    @property
+    def spread(self) -> Optional[float]:
+        if not len(self.bid_px) or not len(self.ask_px): return None
+        return float(self.ask_px[0] - self.bid_px[0])
+
+    def depth(self, levels: int) -> float:
+        """买方前 N 档的名义金额 sum(price * size)。"""
+        n = min(levels, len(self.bid_cum_notional))
+        return float(self.bid_cum_notional[n - 1]) if n > 0 else 0.0
+
+def _parse_levels(levels: Optional[List[Dict]]):
+    if not levels:
+        return _EMPTY, _EMPTY
+    px = np.fromiter((float(l['price']) for l in levels), dtype=np.float64, count=len(levels))
+    sz = np.fromiter((float(l['size']) for l in levels), dtype=np.float64, count=len(levels))
+    return px, sz
@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from typing import Dict, List, Optional, Set, Tuple
+from py_clob_client.clob_types import OrderArgs, OrderType, PostOrdersArgs
+from .config import settings
+
+class OrderGateway:
+    """
+    下单网关 (异步 API)：
+    - 签名：clob_client.create_order 是同步的 ECDSA 签名，放到专用线程池执行，不再阻塞事件循环；
+      多个 Bot 同时出信号时各自并行签名，后到的订单不必排在前面所有签名之后
+    - 提交：签好的订单进入提交队列，ORDER_BATCH_WINDOW_SECONDS 内到达的订单合并为一次
+      POST /orders (每批最多 ORDER_BATCH_MAX 笔)，单笔时退化为 POST /order
+    每笔订单的调用方各自拿到自己的响应 ({"success", "orderID", "errorMsg", ...})。
+    """
+    def __init__(self, clob_client, workers: int = None):
+        self.client = clob_client
+        self.signer = ThreadPoolExecutor(max_workers=workers or settings.ORDER_SIGNING_WORKERS, thread_name_prefix="order-sign")
+        self._pending: List[Tuple[PostOrdersArgs, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None   # 仍在合并窗口中的 flush
+        self._posting: Set[asyncio.Task] = set()          # 窗口已关闭、正在 POST 的 flush
+
+    async def sign(self, order_args: OrderArgs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.signer, self.client.create_order, order_args)
+
+    async def place(self, order_args: OrderArgs, order_type: str = OrderType.GTC, post_only: bool = False) -> Optional[Dict]:
+        """签名并提交一笔订单，返回 CLOB 响应；签名或提交失败时抛出异常。"""
+        signed = await self.sign(order_args)
+        return await self.submit(signed, order_type, post_only)
+
+    async def submit(self, signed_order, order_type: str = OrderType.GTC, post_only: bool = False) -> Optional[Dict]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((PostOrdersArgs(order=signed_order, orderType=order_type, postOnly=post_only), future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        # 等待一个很短的合并窗口，让同一 tick 内签好的订单一起提交
+        await asyncio.sleep(settings.ORDER_BATCH_WINDOW_SECONDS)
+        pending, self._pending = self._pending, []
+        # 窗口已关闭：之后提交的订单开启新的合并窗口，不必等本批 POST 返回
+        task = asyncio.current_task()
+        if self._flush_task is task:
+            self._flush_task = None
+        self._posting.add(task)
+        task.add_done_callback(self._posting.discard)
+        size = max(1, settings.ORDER_BATCH_MAX)
+        await asyncio.gather(*(self._post_batch(pending[i:i + size]) for i in range(0, len(pending), size)))
+
+    async def _post_batch(self, batch: List[Tuple[PostOrdersArgs, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            if len(batch) == 1:
+                args = batch[0][0]
+                results = [await loop.run_in_executor(None, self.client.post_order, args.order, args.orderType, args.postOnly)]
+            else:
+                results = await loop.run_in_executor(None, self.client.post_orders, [args for args, _ in batch])
+                if not isinstance(results, list) or len(results) != len(batch):
+                    raise ValueError(f"Unexpected /orders response: {results}")
+        except Exception as e:
+            logger.error(f"Order submission failed for {len(batch)} orders: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if len(batch) > 1:
+            logger.debug(f"Submitted {len(batch)} orders in one batch.")
+        for (_, future), resp in zip(batch, results):
+            if not future.done():
+                future.set_result(resp)
+
+    def close(self):
+        self.signer.shutdown(wait=False, cancel_futures=True)
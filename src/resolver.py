@@ -0,0 +1,112 @@
+import asyncio
+import json
+from loguru import logger
+from typing import Dict, List, Optional, Tuple
+from .config import settings
+from .http_client import http_client
+from .learning import extract_features, outcome_increments
+from .trade_writer import trade_writer
+from . import db
+
+GAMMA_MARKETS_URL = "https://gamma-api.polymarket.com/markets"
+
+class TradeResolver:
+    """
+    模拟盘成交结算：
+    - 每 RESOLVE_INTERVAL_SECONDS 读取一次全部未结算的 paper 成交，按 token (market_id) 分组
+    - 按 RESOLVE_TOKENS_PER_REQUEST 个 token 一次向 Gamma /markets 批量查询已关闭市场的结算价，
+      并发受 GAMMA_PAGE_CONCURRENCY 限制
+    - 本轮所有已结算成交的 outcome / pnl 与学习更新作为一批交给 TradeWriter，在同一事务中写入
+    HTTP 请求数按 token 数 / 批大小计，提交次数每轮一次，与成交数无关。
+    """
+    def __init__(self, bots: Optional[List] = None):
+        self.bots = bots or []
+        self.is_running = False
+
+    async def run(self):
+        self.is_running = True
+        while self.is_running:
+            try:
+                await self.resolve_once()
+            except Exception as e:
+                logger.error(f"Trade resolution failed: {e}")
+            await asyncio.sleep(settings.RESOLVE_INTERVAL_SECONDS)
+
+    def stop(self):
+        self.is_running = False
+
+    async def resolve_once(self) -> int:
+        loop = asyncio.get_running_loop()
+        trades = await loop.run_in_executor(None, db.get_unresolved_trades)
+        if not trades: return 0
+
+        by_token: Dict[str, List[Dict]] = {}
+        for trade in trades:
+            by_token.setdefault(trade["market_id"], []).append(trade)
+
+        settled = await self.fetch_settlements(list(by_token))
+        resolutions: List[Tuple] = []
+        learning: List[Tuple] = []
+        for token_id, won in settled.items():
+            for trade in by_token.get(token_id, []):
+                payout = (trade["shares_bought"] or 0.0) if won else 0.0
+                pnl = payout - (trade["amount"] or 0.0)
+                resolutions.append(("win" if won else "loss", pnl, trade["id"]))
+                features = extract_features(trade["entry_price"] or 0.0, _hour_of(trade["created_at"]))
+                learning.extend((trade["bot_name"], feat, w, l) for feat, w, l in outcome_increments(features, trade["side"], won))
+        if not resolutions: return 0
+
+        # 等待本批落库后再进入下一轮，避免重复结算仍在队列中的成交
+        await asyncio.wrap_future(trade_writer.settle(resolutions, learning))
+        resolved_ids = {trade_id for _, _, trade_id in resolutions}
+        for bot in self.bots:
+            for key in [k for k, p in bot.active_positions.items() if p.get("trade_id") in resolved_ids]:
+                bot.active_positions.pop(key, None)
+        logger.info(f"Resolved {len(resolutions)} paper trades across {len(settled)} settled markets.")
+        return len(resolutions)
+
+    async def fetch_settlements(self, token_ids: List[str]) -> Dict[str, bool]:
+        """返回已结算 token -> 是否获胜 (结算价为 1)；未关闭或尚未给出结算价的 token 不出现在结果中。"""
+        size = max(1, settings.RESOLVE_TOKENS_PER_REQUEST)
+        sem = asyncio.Semaphore(max(1, settings.GAMMA_PAGE_CONCURRENCY))
+        wanted = set(token_ids)
+        settled: Dict[str, bool] = {}
+
+        async def fetch_chunk(chunk: List[str]):
+            params = [("closed", "true"), ("limit", len(chunk))] + [("clob_token_ids", t) for t in chunk]
+            async with sem:
+                try:
+                    markets = await http_client.get_json(GAMMA_MARKETS_URL, params=params)
+                except Exception as e:
+                    logger.warning(f"Gamma settlement lookup for {len(chunk)} tokens failed: {e}")
+                    return
+            for market in markets if isinstance(markets, list) else []:
+                for token_id, won in _settlement_prices(market):
+                    if token_id in wanted:
+                        settled[token_id] = won
+
+        await asyncio.gather(*(fetch_chunk(token_ids[i:i + size]) for i in range(0, len(token_ids), size)))
+        return settled
+
+def _settlement_prices(market: Dict) -> List[Tuple[str, bool]]:
+    """已关闭市场中结算价为 1 / 0 的 token；争议中或价格未归一的市场返回空。"""
+    if not market.get("closed"): return []
+    try:
+        token_ids = json.loads(market.get("clobTokenIds") or "[]")
+        prices = [float(p) for p in json.loads(market.get("outcomePrices") or "[]")]
+    except (TypeError, ValueError):
+        return []
+    result = []
+    for token_id, price in zip(token_ids, prices):
+        if price >= 0.99:
+            result.append((token_id, True))
+        elif price <= 0.01:
+            result.append((token_id, False))
+    return result
+
+def _hour_of(created_at: Optional[str]) -> Optional[int]:
+    # created_at 为 SQLite CURRENT_TIMESTAMP 格式 (UTC)：YYYY-MM-DD HH:MM:SS
+    try:
+        return int(created_at[11:13])
+    except (TypeError, ValueError):
+        return None
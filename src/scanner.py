@@ -1,73 +1,107 @@
 import asyncio
+import json
+import time
 from datetime import datetime, timezone, timedelta
 from loguru import logger
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from .config import settings
+from .http_client import http_client, HttpStatusError
+from .filters import get_market_filter
+from .universe import MarketUniverse, shard_of
+
+GAMMA_EVENTS_URL = "https://gamma-api.polymarket.com/events"
+
+_MISSING = object()
+
+class OutcomeView:
+    """
+    单个 CLOB token (YES/NO 等) 的轻量视图。
+    只保存 token_id / 方向 / 带前缀的问题，其余字段全部指向共享的父市场记录，
+    取代原先每个 token 一次 copy.deepcopy(market)。支持 dict 风格的 get / [] 读取。
+    """
+    __slots__ = ("market", "token_id", "side", "question")
+
+    def __init__(self, market: Dict, token_id: str, side: str, question: str):
+        self.market = market
+        self.token_id = token_id
+        self.side = side
+        self.question = question
+
+    def get(self, key: str, default=None):
+        if key == 'token_id': return self.token_id
+        if key == 'question': return self.question
+        if key == 'side': return self.side
+        return self.market.get(key, default)
+
+    def __getitem__(self, key: str):
+        val = self.get(key, _MISSING)
+        if val is _MISSING:
+            raise KeyError(key)
+        return val
+
+    def __contains__(self, key: str) -> bool:
+        return key in ('token_id', 'question', 'side') or key in self.market
+
+    def __repr__(self) -> str:
+        return f"OutcomeView({self.token_id!r}, {self.question[:40]!r})"
+
+def parse_end_ts(end_time_str: Optional[str]) -> Optional[float]:
+    """
+    将 Gamma 的 endDate 解析为 epoch 秒；每个市场入库时只解析一次。
+    """
+    if not end_time_str: return None
+    try:
+        # 处理不带 T 的日期格式 (如 2026-02-23)
+        if 'T' not in end_time_str:
+            end_time_str += 'T23:59:59'
+        
+        # 确保 ISO 格式带时区标识
+        if not end_time_str.endswith('Z') and '+' not in end_time_str:
+            end_time_str += 'Z'
+
+        return datetime.fromisoformat(end_time_str.replace('Z', '+00:00')).timestamp()
+    except Exception as e:
+        logger.debug(f"Time parsing error for {end_time_str}: {e}")
+        return None
 
 class MarketScanner:
-    def __init__(self, clob_client):
+    def __init__(self, clob_client, shard: Optional[Tuple[int, int]] = None):
         self.client = clob_client
+        # 分片模式 (index, count)：只保留 shard_of(token_id) == index 的 token
+        self.shard = shard
+        self.universe = MarketUniverse()
+        self.last_fetch_complete = False
+        self._filter_key = None
+        # 上次评估时的时间窗口 (start_ts, end_ts)，advance_window 只处理两次之间滑过边界的市场
+        self._window_bounds: Optional[Tuple[float, float]] = None
 
-    async def get_eligible_markets(self) -> List[Dict]:
+    async def get_eligible_markets(self) -> List[OutcomeView]:
         """
-        V7.0 极短线扫描逻辑：
+        V7.0 极短线扫描逻辑 (增量模式)：
         1. 过滤黑名单词汇
         2. 过滤黑名单分类 (Categories)
         3. 时间窗口：仅 1h - 12h
         4. 流动性深度 >= 5 * OrderAmount
         5. 动量趋势过滤：拒绝下跌趋势
+        
+        结果先合并进常驻的 MarketUniverse，仅返回本轮需要重新评估的候选：
+        新出现 / 字段变更 / 刚进入时间窗口 / 超过 UNIVERSE_FULL_REFRESH_SECONDS 未评估。
         """
         logger.info("Scanning for Scalpel V7.0 opportunities...")
         try:
             all_markets = await self.fetch_active_markets() 
-            eligible = []
+            now = time.time()
             
-            stats = {
-                "total": len(all_markets),
-                "filtered_category": 0,
-                "filtered_poison": 0,
-                "filtered_time": 0,
-                "filtered_safety": 0
-            }
+            # 只有完整拉取时才剔除消失的市场，避免单页失败清空索引
+            delta = self.universe.ingest(all_markets, now, evict=self.last_fetch_complete)
+            logger.debug(f"Fetched {len(all_markets)} total active markets from API.")
             
-            logger.debug(f"Fetched {stats['total']} total active markets from API.")
-            
-            for market in all_markets:
-                question = market.get('question', 'Unknown')
-                
-                # 0. 黑名单过滤 (Poison Keywords) 先执行，确保统计准确
-                if self._is_poisoned(market):
-                    logger.debug(f"SKIP [Poison] {question[:50]}...")
-                    stats["filtered_poison"] += 1
-                    continue
-                
-                # 1. 检查分类 (Category & Tags)
-                category = market.get('category') or ""
-                tags = [t.get('label', '') for t in market.get('tags', [])] if isinstance(market.get('tags'), list) else []
-                combined_cat_info = (category + " " + " ".join(tags)).lower()
-                
-                excluded_cats = [c.strip().lower() for c in settings.EXCLUDED_CATEGORIES.split(',') if c.strip()]
-                is_excluded = False
-                for ec in excluded_cats:
-                    if ec in combined_cat_info:
-                        logger.debug(f"SKIP [Cat:{ec}] {question[:40]}...")
-                        stats["filtered_category"] += 1
-                        is_excluded = True
-                        break
-                if is_excluded: continue
-                
-                # 2. 极短线时间窗口过滤
-                if not self._check_time_window(market):
-                    logger.debug(f"SKIP [Time] {question[:50]}...")
-                    stats["filtered_time"] += 1
-                    continue
-                
-                # 3. 交由 Bots 自行进行安全检查和策略判定
-                eligible.append(market)
+            eligible, stats = self.evaluate_universe(now)
             
             summary = (
                 f"Scan Complete! {len(eligible)} Candidates Found.\n"
-                f"  Summary ({stats['total']} analyzed):\n"
+                f"  Universe {len(self.universe)} | Δ {delta['new']} new, {delta['changed']} changed, {delta['evicted']} evicted\n"
+                f"  Summary ({stats['evaluated']} of {len(all_markets)} analyzed):\n"
                 f"  🚫 {stats['filtered_category']} Cat | ☠️ {stats['filtered_poison']} Poison | ⏳ {stats['filtered_time']} Time"
             )
             logger.info(summary)
@@ -76,70 +110,130 @@ class MarketScanner:
             logger.error(f"Scan failed: {e}")
             return []
 
-    def _is_poisoned(self, market: Dict) -> bool:
-        content = (str(market.get('question', '')) + " " + str(market.get('description', ''))).lower()
-        keywords = [k.strip().lower() for k in settings.POISON_KEYWORDS.split(',') if k.strip()]
-        for kw in keywords:
-            if kw in content:
-                return True
-        return False
-
-    def _check_time_window(self, market: Dict) -> bool:
+    def evaluate_universe(self, now: Optional[float] = None) -> Tuple[List[OutcomeView], Dict[str, int]]:
         """
-        V7.0 严苛时间窗口：仅允许 1h - 12h
+        不发起网络请求，仅基于本地索引重新评估：
+        时间窗口通过按到期时间排序的索引做区间查找，过滤结果按条目缓存。
         """
-        try:
-            end_time_str = market.get('end_date_iso')
-            if not end_time_str: return False
+        now = now or time.time()
+        eligible = []
+        stats = {
+            "evaluated": 0,
+            "filtered_category": 0,
+            "filtered_poison": 0,
+            "filtered_time": 0,
+            "filtered_safety": 0
+        }
+        
+        market_filter = get_market_filter()
+        if market_filter.key != self._filter_key:
+            self._filter_key = market_filter.key
+            self.universe.invalidate()
+        
+        # 2. 极短线时间窗口：区间查找，而不是逐个解析日期
+        self._window_bounds = self._window_at(now)
+        window = set(self.universe.window(*self._window_bounds))
+        
+        stale_before = now - settings.UNIVERSE_FULL_REFRESH_SECONDS
+        for token_id, entry in self.universe.entries.items():
+            market = entry.view
+            in_window = token_id in window
+            entered = in_window and not entry.in_window
+            entry.in_window = in_window
             
-            # 处理不带 T 的日期格式 (如 2026-02-23)
-            if 'T' not in end_time_str:
-                end_time_str += 'T23:59:59'
+            if entry.dirty:
+                # 0 + 1. 黑名单词汇 (Poison Keywords) 与分类 (Category & Tags) 一次性预编译匹配
+                # 违禁词先于分类判定，确保统计准确；结果缓存到条目上直到字段变化
+                entry.verdict = market_filter.classify(market)
+                entry.dirty = False
+            elif not entered and entry.last_evaluated >= stale_before:
+                continue # 无增量，跳过
             
-            # 确保 ISO 格式带时区标识
-            if not end_time_str.endswith('Z') and '+' not in end_time_str:
-                end_time_str += 'Z'
+            entry.last_evaluated = now
+            stats["evaluated"] += 1
+            question = market.get('question', 'Unknown')
+            
+            if entry.verdict:
+                reason, term = entry.verdict
+                if reason == "poison":
+                    logger.debug(f"SKIP [Poison:{term}] {question[:50]}...")
+                    stats["filtered_poison"] += 1
+                else:
+                    logger.debug(f"SKIP [Cat:{term}] {question[:40]}...")
+                    stats["filtered_category"] += 1
+                continue
+            
+            if not in_window:
+                logger.debug(f"SKIP [Time] {question[:50]}...")
+                stats["filtered_time"] += 1
+                continue
+            
+            # 3. 交由 Bots 自行进行安全检查和策略判定
+            eligible.append(market)
+        
+        return eligible, stats
 
-            end_time = datetime.fromisoformat(end_time_str.replace('Z', '+00:00'))
-            now = datetime.now(timezone.utc)
-            hours_to_end = (end_time - now).total_seconds() / 3600
+    def advance_window(self, now: Optional[float] = None) -> Tuple[List[OutcomeView], List[str]]:
+        """
+        窗口变化唤醒时使用，不遍历整个索引：
+        窗口随时间前移，只有到期时间落在 [上次起点, 本次起点] 或 [上次终点, 本次终点] 内的市场可能进出窗口，
+        两段都用 by_expiry 区间查找，代价 O(log N + 变化数)。
+        返回 (新进入窗口且通过过滤的市场, 离开窗口的 token_id)；尚未做过全量评估时返回空。
+        """
+        now = now or time.time()
+        if self._window_bounds is None: return [], []
+        (prev_start, prev_end), (start, end) = self._window_bounds, self._window_at(now)
+        self._window_bounds = (start, end)
 
-            # 必须在设定的极短线窗口内
-            if settings.MIN_HOURS_TO_EXPIRY <= hours_to_end <= settings.MAX_HOURS_TO_EXPIRY:
-                return True
-            return False
-        except Exception as e:
-            logger.debug(f"Time parsing error for {market.get('question')}: {e}")
-            return False
+        market_filter = get_market_filter()
+        entered, left = [], []
+        candidates = self.universe.window(prev_start, start) + self.universe.window(prev_end, end)
+        for token_id in candidates:
+            entry = self.universe.get(token_id)
+            in_window = start <= entry.end_ts <= end
+            if in_window == entry.in_window: continue
+            entry.in_window = in_window
+            if not in_window:
+                left.append(token_id)
+                continue
+            if entry.dirty:
+                entry.verdict = market_filter.classify(entry.view)
+                entry.dirty = False
+            entry.last_evaluated = now
+            if entry.verdict is None:
+                entered.append(entry.view)
+        return entered, left
+
+    @staticmethod
+    def _window_at(now: float) -> Tuple[float, float]:
+        return now + settings.MIN_HOURS_TO_EXPIRY * 3600, now + settings.MAX_HOURS_TO_EXPIRY * 3600
+
+    def seconds_until_window_change(self, now: Optional[float] = None) -> Optional[float]:
+        """下一个市场进入或离开 MIN/MAX_HOURS_TO_EXPIRY 窗口前还剩多少秒 (无则 None)。"""
+        return self.universe.next_transition(
+            now or time.time(),
+            settings.MIN_HOURS_TO_EXPIRY * 3600,
+            settings.MAX_HOURS_TO_EXPIRY * 3600
+        )
 
-    async def fetch_active_markets(self) -> List[Dict]:
-        import requests
-        from datetime import datetime, timezone, timedelta
+    async def fetch_active_markets(self) -> List[OutcomeView]:
+        self.last_fetch_complete = False
         try:
             markets = []
             limit = 100
-            offset = 0
             max_pages = 50 # 允许拉取更多页，但由于有时间过滤，通常几页就结束了
             
-            loop = asyncio.get_event_loop()
             now = datetime.now(timezone.utc)
             min_date = (now + timedelta(hours=settings.MIN_HOURS_TO_EXPIRY)).strftime('%Y-%m-%dT%H:%M:%SZ')
-            max_date = (now + timedelta(hours=settings.MAX_HOURS_TO_EXPIRY)).strftime('%Y-%m-%dT%H:%M:%SZ')
+            # 多拉取一段窗口外的市场，使索引提前知道下一个进入窗口的时刻
+            horizon = timedelta(hours=settings.MAX_HOURS_TO_EXPIRY, minutes=settings.UNIVERSE_LOOKAHEAD_MINUTES)
+            max_date = (now + horizon).strftime('%Y-%m-%dT%H:%M:%SZ')
             
             logger.debug(f"Fetching events expiring between {min_date} and {max_date}")
 
-            for page in range(max_pages):
-                url = f"https://gamma-api.polymarket.com/events?active=true&closed=false&end_date_min={min_date}&end_date_max={max_date}&limit={limit}&offset={offset}"
-                resp = await loop.run_in_executor(None, requests.get, url)
-                
-                if resp.status_code != 200:
-                    logger.error(f"Gamma API returned {resp.status_code}: {resp.text}")
-                    break
-                    
-                events = resp.json()
-                if not events:
-                    break # 没有更多数据了
-                    
+            pages = await self._fetch_event_pages(min_date, max_date, limit, max_pages)
+
+            for events in pages:
                 for event in events:
                     event_tags = event.get('tags', [])
                     for m in event.get('markets', []):
@@ -147,39 +241,82 @@ class MarketScanner:
                         m['category'] = event.get('category', 'Unknown')
                         m['tags'] = event_tags # 将事件的标签传递给市场对象
                         m['end_date_iso'] = m.get('endDate', m.get('endDateIso'))
+                        m['end_ts'] = parse_end_ts(m['end_date_iso'])
                         m['condition_id'] = m.get('conditionId')
                         m['oneDayPriceChange'] = m.get('oneDayPriceChange', 0)
                         
-                        # Extract all token IDs (YES/NO) and create separate market entries
+                        m['time_class'] = "A"
+                        
+                        # Extract all token IDs (YES/NO) and create per-outcome views over the shared market record
                         clob_ids = m.get('clobTokenIds')
-                        if clob_ids:
-                            import json
-                            import copy
-                            try:
-                                parsed_ids = json.loads(clob_ids)
-                                if isinstance(parsed_ids, list) and len(parsed_ids) > 0:
-                                    for idx, t_id in enumerate(parsed_ids):
-                                        m_copy = copy.deepcopy(m)
-                                        m_copy['token_id'] = t_id
-                                        
-                                        # Determine side for logging/UI purposes
-                                        outcomes_str = m.get('outcomes', '[]')
-                                        try:
-                                            outcomes = json.loads(outcomes_str)
-                                            side_name = outcomes[idx] if idx < len(outcomes) else f"Outcome {idx}"
-                                        except:
-                                            side_name = "YES" if idx == 0 else "NO"
-                                            
-                                        # Append side to question so logs are clear
-                                        m_copy['question'] = f"[{side_name}] {m.get('question', '')}"
-                                        
-                                        m_copy['time_class'] = "A"
-                                        markets.append(m_copy)
-                            except: pass
-                
-                offset += limit
+                        if not clob_ids: continue
+                        try:
+                            parsed_ids = json.loads(clob_ids)
+                        except Exception:
+                            continue
+                        if not isinstance(parsed_ids, list) or not parsed_ids: continue
+                        
+                        # Determine side names once per market for logging/UI purposes
+                        try:
+                            outcomes = json.loads(m.get('outcomes') or '[]')
+                        except Exception:
+                            outcomes = None
+                        
+                        base_question = m.get('question', '')
+                        for idx, t_id in enumerate(parsed_ids):
+                            if self.shard and shard_of(t_id, self.shard[1]) != self.shard[0]: continue
+                            if outcomes is not None:
+                                side_name = outcomes[idx] if idx < len(outcomes) else f"Outcome {idx}"
+                            else:
+                                side_name = "YES" if idx == 0 else "NO"
+                            # Append side to question so logs are clear
+                            markets.append(OutcomeView(m, t_id, side_name, f"[{side_name}] {base_question}"))
                 
             return markets
         except Exception as e:
             logger.error(f"Failed to fetch from Gamma API: {e}")
             return []
+
+    async def _fetch_event_pages(self, min_date: str, max_date: str, limit: int, max_pages: int) -> List[List[Dict]]:
+        """
+        并发拉取 Gamma /events 分页 (共享连接池 + 信号量限流)。
+        任意一页返回不足 limit 条 (或请求失败) 即视为末页，之后的页不再发起请求。
+        """
+        sem = asyncio.Semaphore(max(1, settings.GAMMA_PAGE_CONCURRENCY))
+        results: Dict[int, List[Dict]] = {}
+        stop_at = max_pages
+        failed = False
+
+        async def fetch_page(page: int):
+            nonlocal stop_at, failed
+            async with sem:
+                if page >= stop_at: return
+                params = {
+                    "active": "true",
+                    "closed": "false",
+                    "end_date_min": min_date,
+                    "end_date_max": max_date,
+                    "limit": limit,
+                    "offset": page * limit
+                }
+                try:
+                    events = await http_client.get_json(GAMMA_EVENTS_URL, params=params)
+                except HttpStatusError as e:
+                    logger.error(f"Gamma API returned {e.status}: {e.body}")
+                    failed = True
+                    stop_at = min(stop_at, page)
+                    return
+                except Exception as e:
+                    logger.error(f"Gamma page {page} failed: {e}")
+                    failed = True
+                    stop_at = min(stop_at, page)
+                    return
+
+            events = events if isinstance(events, list) else []
+            results[page] = events
+            if len(events) < limit:
+                stop_at = min(stop_at, page + 1) # 短页 = 没有更多数据了
+
+        await asyncio.gather(*(fetch_page(p) for p in range(max_pages)))
+        self.last_fetch_complete = not failed
+        return [results[p] for p in sorted(results) if p < stop_at]
@@ -0,0 +1,197 @@
+import heapq
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from .config import settings
+from .features import FeatureRecord
+
+class TokenBucket:
+    """简单令牌桶：rate 个/秒，容量 capacity。"""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def seconds_until(self, amount: float) -> float:
+        self._refill()
+        return max(0.0, (amount - self.tokens) / self.rate) if self.rate > 0 else math.inf
+
+class RefreshScheduler:
+    """
+    按 token 的自适应刷新调度 (替代固定 15 秒全量刷新)：
+    - 每个 token 有自己的到期时刻，最小堆按到期时间弹出 (过期条目惰性删除)
+    - 刷新间隔由“热度”决定：离 Bot 进场价格区间越近、越接近到期、最近越活跃，间隔越短
+      热度 1 -> SCHED_MIN_INTERVAL_SECONDS，热度 0 -> SCHED_MAX_INTERVAL_SECONDS (几何插值)
+    - 价格已在某个 Bot 进场区间内的 token 不受热度衰减影响，间隔不超过 SCHED_IN_BAND_INTERVAL_SECONDS
+    - 全局请求预算：每次弹出的 token 数受 SCHED_BOOK_REQUESTS_PER_SECOND 令牌桶限制
+      (按 BOOK_BATCH_SIZE 个 token 计一次 /books 请求)
+    """
+    def __init__(self):
+        self.min_interval = settings.SCHED_MIN_INTERVAL_SECONDS
+        self.max_interval = settings.SCHED_MAX_INTERVAL_SECONDS
+        self.budget = TokenBucket(settings.SCHED_BOOK_REQUESTS_PER_SECOND, max(1.0, settings.SCHED_BOOK_REQUESTS_PER_SECOND))
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._last_bid: Dict[str, float] = {}
+        self._last_move: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self._due
+
+    def schedule(self, token_id: str, due: float):
+        self._due[token_id] = due
+        heapq.heappush(self._heap, (due, token_id))
+
+    def sync(self, token_ids: Iterable[str], now: Optional[float] = None):
+        """跟踪集合与当前候选对齐：新 token 立即到期，消失的 token 停止跟踪。"""
+        now = now or time.time()
+        wanted = set(token_ids)
+        for token_id in [t for t in self._due if t not in wanted]:
+            self.untrack(token_id)
+        for token_id in wanted:
+            if token_id not in self._due:
+                self.schedule(token_id, now)
+
+    def bump(self, token_ids: Iterable[str], now: Optional[float] = None):
+        """有增量的 token (新出现 / 字段变化 / 刚进入窗口) 立即刷新。"""
+        now = now or time.time()
+        for token_id in token_ids:
+            if token_id in self._due and self._due[token_id] > now:
+                self.schedule(token_id, now)
+
+    def untrack(self, token_id: str):
+        self._due.pop(token_id, None)
+        self._last_bid.pop(token_id, None)
+        self._last_move.pop(token_id, None)
+
+    def _peek(self) -> Optional[Tuple[float, str]]:
+        # 惰性删除：跳过已被重新调度或取消跟踪的旧堆条目
+        while self._heap:
+            due, token_id = self._heap[0]
+            if self._due.get(token_id) == due:
+                return due, token_id
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        now = now or time.time()
+        batch_size = max(1, settings.BOOK_BATCH_SIZE)
+        limit = int(self.budget.available()) * batch_size
+        popped: List[str] = []
+        while len(popped) < limit:
+            head = self._peek()
+            if head is None or head[0] > now: break
+            heapq.heappop(self._heap)
+            popped.append(head[1])
+            self._due[head[1]] = math.inf # 处理完后由 reschedule 重新安排
+        if popped:
+            self.budget.take(math.ceil(len(popped) / batch_size))
+        return popped
+
+    def next_wakeup(self, now: Optional[float] = None) -> Optional[float]:
+        """距离下一个 token 到期 (且预算允许) 还有多少秒。"""
+        now = now or time.time()
+        head = self._peek()
+        if head is None: return None
+        return max(head[0] - now, self.budget.seconds_until(1))
+
+    def reschedule(self, token_id: str, record: Optional[FeatureRecord], bands: Sequence[Tuple[float, float]], now: Optional[float] = None):
+        if token_id not in self._due: return
+        now = now or time.time()
+        self.schedule(token_id, now + self.interval_for(token_id, record, bands, now))
+
+    def interval_for(self, token_id: str, record: Optional[FeatureRecord], bands: Sequence[Tuple[float, float]], now: float) -> float:
+        if not record:
+            return self.max_interval
+
+        # 1. 价格离最近一个 Bot 进场区间的距离
+        bid = record.best_bid
+        distance = min((0.0 if lo <= bid <= hi else min(abs(bid - lo), abs(bid - hi))) for lo, hi in bands) if bands else 1.0
+        band_heat = _clamp(1 - distance / settings.SCHED_BAND_DISTANCE)
+
+        # 2. 越接近 MIN_HOURS_TO_EXPIRY 越热
+        hours = record.hours_to_expiry
+        span = max(settings.MAX_HOURS_TO_EXPIRY - settings.MIN_HOURS_TO_EXPIRY, 1e-9)
+        expiry_heat = _clamp(1 - (hours - settings.MIN_HOURS_TO_EXPIRY) / span) if hours is not None else 0.0
+
+        # 3. 最近是否有价格变化 (在 SCHED_MOVE_DECAY_SECONDS 内线性衰减)
+        last_bid = self._last_bid.get(token_id)
+        if last_bid is not None and last_bid != bid:
+            self._last_move[token_id] = now
+        self._last_bid[token_id] = bid
+        moved_at = self._last_move.get(token_id)
+        move_heat = _clamp(1 - (now - moved_at) / settings.SCHED_MOVE_DECAY_SECONDS) if moved_at is not None else 0.0
+
+        heat = 0.5 * band_heat + 0.3 * move_heat + 0.2 * expiry_heat
+        interval = self.max_interval * (self.min_interval / self.max_interval) ** heat
+        if distance == 0.0:
+            # 已在进场区间内：随时可能触发信号，不能因为暂时没有成交变动就退到十几秒一次
+            interval = min(interval, settings.SCHED_IN_BAND_INTERVAL_SECONDS)
+        return interval
+
+class TimerHeap:
+    """
+    按截止时间排序的定时器集合 (最小堆 + 惰性删除)：
+    add / discard 为 O(log n) / O(1)，pop_expired 一次取出所有已到期的 key，
+    过期堆条目超过一半时整体重建，内存与存活定时器数量成正比。
+    """
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def add(self, key: str, deadline: float):
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    def discard(self, key: str):
+        if self._deadlines.pop(key, None) is not None and len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(d, k) for d, k in self._heap if self._deadlines.get(k) == d]
+            heapq.heapify(self._heap)
+
+    def _peek(self) -> Optional[Tuple[float, str]]:
+        while self._heap:
+            deadline, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return deadline, key
+            heapq.heappop(self._heap)
+        return None
+
+    def next_deadline(self) -> Optional[float]:
+        head = self._peek()
+        return head[0] if head else None
+
+    def pop_expired(self, now: float) -> List[str]:
+        expired = []
+        while True:
+            head = self._peek()
+            if head is None or head[0] > now: break
+            heapq.heappop(self._heap)
+            del self._deadlines[head[1]]
+            expired.append(head[1])
+        return expired
+
+def _clamp(value: float) -> float:
+    return max(0.0, min(1.0, value))
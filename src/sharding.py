@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing as mp
+import queue
+import sys
+import time
+from loguru import logger
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .bots.base_bot import BaseBot
+from .engine import ScanEngine
+from .scanner import MarketScanner
+from .market_data import MarketDataFeed
+from .http_client import http_client
+
+# worker -> 协调进程的消息: (shard_index, bot_name, market, signal)
+Signal = Tuple[int, str, object, Dict]
+
+class ShardPool:
+    """
+    多进程分片扫描 (协调进程侧)：
+    token 按 shard_of(token_id) 哈希分配到 SHARD_WORKERS 个 worker 进程，
+    每个 worker 运行自己的 MarketScanner + 行情订阅 + ScanEngine (Gamma 解析、过滤、Bot 评估)，
+    只把命中的买入信号经队列发回协调进程；下单、持仓限制与写库只发生在协调进程。
+    worker 意外退出时自动重启。
+    """
+    def __init__(self, count: int, bots: List[BaseBot], log_name: Optional[str] = None):
+        self.count = count
+        # worker 只需要 Bot 的类与当前参数，不共享协调进程中的任何状态
+        self.bot_specs = [(bot.__class__, dict(bot.params)) for bot in bots]
+        self.log_name = log_name
+        self.ctx = mp.get_context("spawn")
+        self.queue = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.procs: Dict[int, mp.Process] = {}
+        self.is_running = False
+        self._last_health_check = 0.0
+
+    def start(self):
+        self.is_running = True
+        for index in range(self.count):
+            self._spawn(index)
+        logger.info(f"Started {self.count} scanner shards.")
+
+    def _spawn(self, index: int):
+        log_name = self.log_name.replace(".log", f"_shard{index}.log") if self.log_name else None
+        proc = self.ctx.Process(
+            target=_worker_main,
+            args=(index, self.count, self.bot_specs, self.queue, self.stop_event, log_name),
+            name=f"shard-{index}",
+            daemon=True
+        )
+        proc.start()
+        self.procs[index] = proc
+
+    def _check_workers(self):
+        now = time.monotonic()
+        if now - self._last_health_check < 5: return
+        self._last_health_check = now
+        for index, proc in list(self.procs.items()):
+            if not proc.is_alive():
+                logger.warning(f"Shard {index} exited with code {proc.exitcode}, restarting.")
+                self._spawn(index)
+
+    async def signals(self) -> AsyncIterator[Signal]:
+        """逐条产出 worker 发来的买入信号 (阻塞读取放在线程池中，不阻塞事件循环)。"""
+        loop = asyncio.get_running_loop()
+        while self.is_running:
+            try:
+                item = await loop.run_in_executor(None, self.queue.get, True, 0.5)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            yield item
+
+    def stop(self, timeout: float = 5.0):
+        self.is_running = False
+        self.stop_event.set()
+        for proc in self.procs.values():
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self.procs.clear()
+
+def _worker_main(index: int, count: int, bot_specs, signals, stop_event, log_name: Optional[str]):
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    if log_name:
+        logger.add(log_name, rotation="10 MB", retention="7 days")
+    try:
+        asyncio.run(_run_worker(index, count, bot_specs, signals, stop_event))
+    except KeyboardInterrupt:
+        pass
+
+async def _run_worker(index: int, count: int, bot_specs, signals, stop_event):
+    bots = []
+    for cls, params in bot_specs:
+        bot = cls()
+        bot.params.update(params)
+        bots.append(bot)
+
+    async def dispatch(bot, market, signal):
+        # multiprocessing.Queue.put 由后台线程写管道，不会阻塞事件循环
+        signals.put((index, bot.name, market, signal))
+
+    market_data = MarketDataFeed()
+    engine = ScanEngine(MarketScanner(None, shard=(index, count)), market_data, bots, dispatch)
+    tasks = [asyncio.create_task(engine.run()), asyncio.create_task(market_data.run())]
+    logger.info(f"Shard {index}/{count} started.")
+
+    # daemon 只覆盖协调进程正常退出；被 kill 时 stop_event 不会被设置，需自行检测父进程
+    parent = mp.parent_process()
+    while not stop_event.is_set():
+        if parent is not None and not parent.is_alive():
+            logger.warning(f"Shard {index}: coordinator process is gone, exiting.")
+            break
+        await asyncio.sleep(1)
+
+    engine.stop()
+    await market_data.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await http_client.close()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from loguru import logger
+from typing import List, Optional, Tuple
+from .config import settings
+from . import db
+
+_STOP = object()
+
+class TradeWriter:
+    """
+    异步 write-behind 写库：事件循环只把成交记录 / 结算 / 学习更新放进队列，
+    由唯一的写线程按 TRADE_WRITE_BATCH_SIZE 条或 TRADE_WRITE_FLUSH_SECONDS 秒合并为一个事务，
+    用 executemany 批量写入后一次提交，SQLite 的提交与 fsync 不再阻塞事件循环。
+    log_trade 返回 Future，写入后得到 trade_id。
+    """
+    def __init__(self, batch_size: int = None, flush_seconds: float = None):
+        self.batch_size = batch_size or settings.TRADE_WRITE_BATCH_SIZE
+        self.flush_seconds = flush_seconds or settings.TRADE_WRITE_FLUSH_SECONDS
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive(): return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trade-writer", daemon=True)
+                self._thread.start()
+
+    # === 事件循环侧 API ===
+    def log_trade(self, bot_name, market_id, market_question, side, amount, entry_price, shares_bought,
+                  confidence, reasoning, features, venue, mode) -> "asyncio.Future":
+        """参数与 db.log_trade 相同；返回 asyncio Future，结果为 trade_id。"""
+        row = (bot_name, market_id, market_question, side, amount, entry_price, shares_bought, confidence,
+               reasoning, json.dumps(features) if features else None, venue, mode)
+        return asyncio.wrap_future(self._put("trade", row))
+
+    def settle(self, resolutions: List[Tuple], learning: List[Tuple]) -> Future:
+        """
+        一批结算整体入队，保证在同一事务中写入：
+        resolutions = [(outcome, pnl, trade_id)]，learning = [(bot_name, feature_key, wins, losses)]。
+        """
+        return self._put("update", (resolutions, learning))
+
+    def _put(self, kind: str, payload) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((kind, payload, future))
+        return future
+
+    def stop(self, timeout: float = 5.0):
+        """写完队列中剩余的记录后退出写线程。"""
+        if self._thread is None: return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # === 写线程 ===
+    def _run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is _STOP: break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    running = False
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[str, object, Future]]):
+        trades = [(row, f) for kind, row, f in batch if kind == "trade"]
+        updates = [(payload, f) for kind, payload, f in batch if kind == "update"]
+        resolutions = [r for (rows, _), _ in updates for r in rows]
+        learning = [r for (_, rows), _ in updates for r in rows]
+        try:
+            conn = db.get_conn()
+            with conn:
+                # 写锁下的同一事务内，AUTOINCREMENT 为本批成交分配连续的 id
+                conn.execute("BEGIN IMMEDIATE")
+                trade_ids = []
+                if trades:
+                    conn.executemany('''
+                        INSERT INTO trades (bot_name, market_id, market_question, side, amount, entry_price, shares_bought, confidence, reasoning, trade_features, venue, mode)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', [row for row, _ in trades])
+                    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    trade_ids = range(last_id - len(trades) + 1, last_id + 1)
+                if resolutions:
+                    conn.executemany('''
+                        UPDATE trades SET outcome = ?, pnl = ?, resolved_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', resolutions)
+                if learning:
+                    conn.executemany('''
+                        INSERT INTO bot_learning (bot_name, feature_key, wins, losses)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(bot_name, feature_key) DO UPDATE SET
+                            wins = wins + excluded.wins,
+                            losses = losses + excluded.losses,
+                            updated_at = CURRENT_TIMESTAMP
+                    ''', learning)
+        except Exception as e:
+            logger.error(f"Trade writer flush of {len(batch)} records failed: {e}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), trade_id in zip(trades, trade_ids):
+            future.set_result(trade_id)
+        for _, future in updates:
+            future.set_result(None)
+        if len(batch) > 1:
+            logger.debug(f"Trade writer flushed {len(batch)} records in one transaction.")
+
+trade_writer = TradeWriter()
@@ -0,0 +1,65 @@
+from bisect import bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+# (触发价, 类型 "L1"/"L2", 持仓 key)
+Trigger = Tuple[float, str, str]
+
+class TriggerIndex:
+    """
+    止损触发价索引：token_id -> 按触发价升序排列的 [(level, kind, key)]，并记录每个 token 上次的最优买价。
+    触发条件为 best_bid < level。一次盘口更新只用 bisect 找出上次买价与本次买价之间的触发价，
+    即真正被穿越的那些 (向下穿越 = 触发，向上穿越 = 解除)，
+    因此止损计算量与穿越次数成正比，而不是 持仓数 × 轮询次数。
+    每个持仓可以有自己的触发价 (按持仓或按 Bot 设置)。
+    """
+    def __init__(self):
+        self._levels: Dict[str, List[Trigger]] = {}
+        self._last_bid: Dict[str, float] = {}
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self._levels
+
+    def add(self, token_id: str, key: str, levels: Dict[str, float]):
+        """为持仓 key 登记触发价 {"L1": 0.91, "L2": 0.85}；已登记的会先移除。"""
+        self.remove(token_id, key)
+        triggers = self._levels.setdefault(token_id, [])
+        for kind, level in levels.items():
+            insort(triggers, (float(level), kind, key))
+
+    def remove(self, token_id: str, key: Optional[str] = None):
+        """移除持仓 key 的触发价；key 为 None 时移除该 token 的全部持仓。"""
+        triggers = self._levels.get(token_id)
+        if triggers is None: return
+        if key is not None:
+            triggers[:] = [t for t in triggers if t[2] != key]
+        if key is None or not triggers:
+            self._levels.pop(token_id, None)
+            self._last_bid.pop(token_id, None)
+
+    def active(self, token_id: str) -> List[Trigger]:
+        """当前处于触发状态 (上次买价低于触发价) 的触发价。"""
+        triggers = self._levels.get(token_id, [])
+        bid = self._last_bid.get(token_id)
+        if bid is None: return []
+        return triggers[bisect_right(triggers, (bid, "\uffff", "\uffff")):]
+
+    def update(self, token_id: str, best_bid: float) -> List[Tuple[str, str, bool]]:
+        """
+        记录新的最优买价，返回本次被穿越的触发价 [(kind, key, crossed_down)]。
+        首次报价视为从上方 (无触发) 进入。
+        """
+        triggers = self._levels.get(token_id)
+        if not triggers: return []
+        prev = self._last_bid.get(token_id, float("inf"))
+        self._last_bid[token_id] = best_bid
+        if best_bid == prev: return []
+
+        lo, hi = min(prev, best_bid), max(prev, best_bid)
+        # 状态变化的触发价满足 lo < level <= hi
+        start = bisect_right(triggers, (lo, "\uffff", "\uffff"))
+        end = bisect_right(triggers, (hi, "\uffff", "\uffff"))
+        down = best_bid < prev
+        crossed = triggers[start:end]
+        # 向下穿越时先处理高位触发价 (L1 先于 L2)，向上时相反
+        if down: crossed = crossed[::-1]
+        return [(kind, key, down) for _, kind, key in crossed]
@@ -0,0 +1,156 @@
+import time
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from loguru import logger
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 影响过滤判定或价格判断的父市场字段；其中任一变化即视为“已变更”，需要重新评估
+FINGERPRINT_FIELDS = (
+    'question', 'description', 'category', 'end_date_iso', 'active', 'closed',
+    'oneDayPriceChange', 'bestBid', 'bestAsk', 'lastTradePrice', 'updatedAt'
+)
+
+def market_fingerprint(market: Dict) -> Tuple:
+    tags = market.get('tags')
+    tag_labels = tuple(t.get('label', '') for t in tags) if isinstance(tags, list) else ()
+    return tuple(market.get(f) for f in FINGERPRINT_FIELDS) + (tag_labels,)
+
+def shard_of(token_id: str, count: int) -> int:
+    """token 所属分片：crc32 取模，跨进程、跨重启稳定 (不受 PYTHONHASHSEED 影响)。"""
+    return zlib.crc32(token_id.encode()) % count if count > 1 else 0
+
+class UniverseEntry:
+    __slots__ = ("view", "end_ts", "fingerprint", "first_seen", "last_updated", "last_evaluated",
+                 "verdict", "in_window", "dirty")
+
+    def __init__(self, view, fingerprint: Tuple, now: float):
+        self.view = view
+        self.end_ts = view.get('end_ts')  # 到期时间 (epoch 秒)，入库时解析一次
+        self.fingerprint = fingerprint
+        self.first_seen = now
+        self.last_updated = now
+        self.last_evaluated = 0.0
+        self.verdict = None        # 过滤结果缓存：None = 通过, 否则为 (reason, term)
+        self.in_window = False
+        self.dirty = True
+
+class MarketUniverse:
+    """
+    常驻内存的市场索引 (token_id -> UniverseEntry，另有 condition_id -> token_ids)。
+    每轮扫描只标记新增 / 字段变更的条目，并剔除本轮已不在 Gamma 结果中的市场，
+    以便扫描器只对“增量”重新过滤和拉取订单簿。
+    
+    另维护按到期时间排序的 (end_ts, token_id) 列表，时间窗口用 bisect 区间查找，
+    并可算出下一个市场进入/离开窗口的时刻。
+    """
+    def __init__(self):
+        self.entries: Dict[str, UniverseEntry] = {}
+        self.by_condition: Dict[str, Set[str]] = {}
+        self.by_expiry: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, token_id: str) -> Optional[UniverseEntry]:
+        return self.entries.get(token_id)
+
+    def ingest(self, views: Iterable, now: Optional[float] = None, evict: bool = True) -> Dict[str, int]:
+        """
+        合并一轮 Gamma 结果。返回 {"new", "changed", "evicted"} 计数。
+        evict=False 时 (本轮拉取不完整) 只做新增/更新，不剔除缺席的市场。
+        """
+        now = now or time.time()
+        seen: Set[str] = set()
+        fingerprints: Dict[int, Tuple] = {}
+        counts = {"new": 0, "changed": 0, "evicted": 0}
+
+        for view in views:
+            token_id = view.token_id
+            if not token_id or token_id in seen: continue
+            seen.add(token_id)
+
+            # 同一父市场下的多个 token 共享一次指纹计算
+            parent = view.market
+            fp = fingerprints.get(id(parent))
+            if fp is None:
+                fp = fingerprints[id(parent)] = market_fingerprint(parent)
+
+            entry = self.entries.get(token_id)
+            if entry is None:
+                entry = self.entries[token_id] = UniverseEntry(view, fp, now)
+                if entry.end_ts is not None:
+                    insort(self.by_expiry, (entry.end_ts, token_id))
+                condition_id = parent.get('condition_id')
+                if condition_id:
+                    self.by_condition.setdefault(condition_id, set()).add(token_id)
+                counts["new"] += 1
+                continue
+
+            entry.view = view
+            if entry.fingerprint != fp:
+                entry.fingerprint = fp
+                entry.last_updated = now
+                entry.dirty = True
+                counts["changed"] += 1
+                end_ts = view.get('end_ts')
+                if end_ts != entry.end_ts:
+                    self._unindex_expiry(entry, token_id)
+                    entry.end_ts = end_ts
+                    if end_ts is not None:
+                        insort(self.by_expiry, (end_ts, token_id))
+
+        if evict:
+            for token_id in [t for t in self.entries if t not in seen]:
+                self.evict(token_id)
+                counts["evicted"] += 1
+
+        return counts
+
+    def evict(self, token_id: str):
+        entry = self.entries.pop(token_id, None)
+        if entry is None: return
+        self._unindex_expiry(entry, token_id)
+        condition_id = entry.view.get('condition_id')
+        tokens = self.by_condition.get(condition_id)
+        if tokens is not None:
+            tokens.discard(token_id)
+            if not tokens:
+                self.by_condition.pop(condition_id, None)
+
+    def _unindex_expiry(self, entry: UniverseEntry, token_id: str):
+        if entry.end_ts is None: return
+        key = (entry.end_ts, token_id)
+        idx = bisect_left(self.by_expiry, key)
+        if idx < len(self.by_expiry) and self.by_expiry[idx] == key:
+            del self.by_expiry[idx]
+
+    def window(self, start_ts: float, end_ts: float) -> List[str]:
+        """到期时间落在 [start_ts, end_ts] 内的 token_id (按到期时间升序)。"""
+        lo = bisect_left(self.by_expiry, (start_ts, ""))
+        hi = bisect_right(self.by_expiry, (end_ts, "\uffff"))
+        return [token_id for _, token_id in self.by_expiry[lo:hi]]
+
+    def next_transition(self, now: float, min_seconds: float, max_seconds: float) -> Optional[float]:
+        """
+        距离下一次窗口变化还有多少秒：
+        - 窗口内最早到期的市场剩余时间跌破 min_seconds (离开窗口)
+        - 窗口外最早到期的市场剩余时间进入 max_seconds (进入窗口)
+        """
+        waits = []
+        lo = bisect_left(self.by_expiry, (now + min_seconds, ""))
+        if lo < len(self.by_expiry):
+            waits.append(self.by_expiry[lo][0] - min_seconds - now)
+        hi = bisect_right(self.by_expiry, (now + max_seconds, "\uffff"))
+        if hi < len(self.by_expiry):
+            waits.append(self.by_expiry[hi][0] - max_seconds - now)
+        return max(0.0, min(waits)) if waits else None
+
+    def invalidate(self):
+        """过滤配置变化时调用：所有条目在下一轮重新评估。"""
+        for entry in self.entries.values():
+            entry.dirty = True
+        logger.debug(f"Universe invalidated ({len(self.entries)} entries).")
+
+    def eligible(self) -> List:
+        """当前通过过滤且位于时间窗口内的全部市场 (不论是否有增量)。"""
+        return [e.view for e in self.entries.values() if e.verdict is None and e.in_window]
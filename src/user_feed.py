@@ -0,0 +1,153 @@
+import asyncio
+import json
+import websockets
+from loguru import logger
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from .config import settings
+
+# 成交回调: fill_data = {"order_id", "size", "price", "token_id"}，与 RiskMonitor 轮询得到的格式一致
+FillListener = Callable[[Dict], Awaitable[None]]
+
+class UserFeed:
+    """
+    CLOB 用户 WebSocket (user channel，API Key 鉴权)：
+    - order 事件：UPDATE 时按 size_matched 判断入场单是否已完全成交；CANCELLATION 时移除入场单
+    - trade 事件 (MATCHED)：按 maker_orders / taker_order_id 累计本方入场单的成交量
+    入场单累计成交达到下单数量即回调监听者 (RiskMonitor -> handle_order_fill 挂止盈)，
+    成交到止盈只差一条推送，不再等待轮询。REST 对账由 RiskMonitor 低频兜底。
+    """
+    def __init__(self, execution_engine, url: str = None):
+        self.execution = execution_engine
+        self.url = url or settings.CLOB_WS_USER_URL
+        self.listeners: List[FillListener] = []
+        self.is_running = False
+        self._ws = None
+        self._size_matched: Dict[str, float] = {}       # order_id -> order 事件给出的累计成交 (size_matched)
+        self._traded: Dict[str, float] = {}             # order_id -> 不重复的 trade 成交数量之和
+        self._seen_trades: Set[Tuple[str, str]] = set() # (trade_id, order_id)，同一成交只计一次
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ws is not None
+
+    def add_listener(self, listener: FillListener):
+        self.listeners.append(listener)
+
+    async def run(self):
+        if settings.PAPER_MODE or not settings.CLOB_API_KEY:
+            return # 模拟盘没有真实订单
+        self.is_running = True
+        while self.is_running:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, max_size=None) as ws:
+                    await ws.send(json.dumps({
+                        "auth": {
+                            "apiKey": settings.CLOB_API_KEY,
+                            "secret": settings.CLOB_API_SECRET,
+                            "passphrase": settings.CLOB_PASSPHRASE
+                        },
+                        "markets": [],
+                        "type": "user"
+                    }))
+                    self._ws = ws
+                    logger.info("User feed connected.")
+
+                    heartbeat = asyncio.create_task(self._heartbeat(ws))
+                    try:
+                        async for raw in ws:
+                            await self._on_message(raw)
+                    finally:
+                        heartbeat.cancel()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"User feed disconnected: {e}")
+            finally:
+                self._ws = None
+            if self.is_running:
+                await asyncio.sleep(settings.CLOB_WS_RECONNECT_SECONDS)
+
+    async def stop(self):
+        self.is_running = False
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _heartbeat(self, ws):
+        while True:
+            await asyncio.sleep(10)
+            await ws.send("PING")
+
+    async def _on_message(self, raw):
+        if raw == "PONG": return
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return
+        events = payload if isinstance(payload, list) else [payload]
+        for event in events:
+            event_type = event.get("event_type")
+            if event_type == "order":
+                await self._on_order(event)
+            elif event_type == "trade":
+                await self._on_trade(event)
+
+    async def _on_order(self, event: Dict):
+        order_id = event.get("id")
+        if order_id not in self.execution.active_entry_orders: return
+
+        if event.get("type") == "CANCELLATION":
+            if order_id not in self.execution.tp_placed_orders:
+                self.execution.close_entry(order_id)
+                self._forget(order_id)
+            return
+
+        matched = _as_float(event.get("size_matched"))
+        if matched <= 0: return
+        self._size_matched[order_id] = max(self._size_matched.get(order_id, 0.0), matched)
+        await self._check_filled(order_id, _as_float(event.get("original_size")), _as_float(event.get("price")))
+
+    async def _on_trade(self, event: Dict):
+        if event.get("status") != "MATCHED": return # 之后的 MINED / CONFIRMED 是同一笔成交
+        trade_id = event.get("id")
+        fills = [(m.get("order_id"), m.get("matched_amount"), m.get("price")) for m in event.get("maker_orders") or []]
+        fills.append((event.get("taker_order_id"), event.get("size"), event.get("price")))
+
+        for order_id, amount, price in fills:
+            if order_id not in self.execution.active_entry_orders: continue
+            if (trade_id, order_id) in self._seen_trades: continue
+            self._seen_trades.add((trade_id, order_id))
+            self._traded[order_id] = self._traded.get(order_id, 0.0) + _as_float(amount)
+            await self._check_filled(order_id, None, _as_float(price))
+
+    async def _check_filled(self, order_id: str, original_size: Optional[float], price: float):
+        if order_id in self.execution.tp_placed_orders: return
+        info = self.execution.active_entry_orders[order_id]
+        target = original_size or info.get("size")
+        # 两路推送描述的是同一批成交，取较大者而不是相加，避免重复计数
+        matched = max(self._size_matched.get(order_id, 0.0), self._traded.get(order_id, 0.0))
+        # 下单数量未知 (旧日志恢复的订单) 时与轮询一致：出现成交即视为成交
+        if target and matched + 1e-9 < target: return
+
+        fill_data = {
+            "order_id": order_id,
+            "size": matched,
+            "price": price or info.get("price", 0.0),
+            "token_id": info["token_id"]
+        }
+        for listener in self.listeners:
+            try:
+                await listener(fill_data)
+            except Exception as e:
+                logger.error(f"User feed listener error: {e}")
+        self._forget(order_id)
+
+    def _forget(self, order_id: str):
+        self._size_matched.pop(order_id, None)
+        self._traded.pop(order_id, None)
+        self._seen_trades = {k for k in self._seen_trades if k[1] != order_id}
+
+def _as_float(value) -> float:
+    try:
+        return float(value) if value is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
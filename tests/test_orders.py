@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+
+# Settings 在导入时从环境变量 / keyring 读取密钥；测试中全部由环境变量提供
+for key, value in {
+    "WALLET_ADDRESS": "0x0",
+    "EOA_PRIVATE_KEY": "0x" + "11" * 32,
+    "CLOB_API_KEY": "k",
+    "CLOB_API_SECRET": "s",
+    "CLOB_PASSPHRASE": "p",
+    "FUNDER_ADDRESS": "0x0",
+    "SIGNATURE_TYPE": "0",
+}.items():
+    os.environ.setdefault(key, value)
+
+from src.orders import OrderGateway
+
+
+class SlowClient:
+    """post_order 耗时 0.3 秒，模拟一批订单仍在提交中。"""
+    def __init__(self):
+        self.posted = []
+
+    def create_order(self, order_args):
+        return order_args
+
+    def post_order(self, order, order_type, post_only=False):
+        time.sleep(0.3)
+        self.posted.append(order)
+        return {"success": True, "orderID": order}
+
+    def post_orders(self, args):
+        time.sleep(0.3)
+        self.posted.extend(a.order for a in args)
+        return [{"success": True, "orderID": a.order} for a in args]
+
+
+def test_submit_during_post_is_not_stranded():
+    async def scenario():
+        client = SlowClient()
+        gateway = OrderGateway(client, workers=1)
+        try:
+            first = asyncio.create_task(gateway.submit("o1"))
+            await asyncio.sleep(0.1)
+            second = asyncio.create_task(gateway.submit("o2"))
+            return await asyncio.wait_for(asyncio.gather(first, second), timeout=2.0), client.posted
+        finally:
+            gateway.close()
+
+    results, posted = asyncio.run(scenario())
+    assert [r["orderID"] for r in results] == ["o1", "o2"]
+    assert sorted(posted) == ["o1", "o2"]
+
+
+class RecordingClient(SlowClient):
+    """记录每次提交调用的订单数，不等待。"""
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def post_order(self, order, order_type, post_only=False):
+        self.calls.append(1)
+        return {"success": True, "orderID": order}
+
+    def post_orders(self, args):
+        self.calls.append(len(args))
+        return [{"success": True, "orderID": a.order} for a in args]
+
+
+def test_concurrent_places_share_one_batch():
+    async def scenario():
+        client = RecordingClient()
+        gateway = OrderGateway(client, workers=4)
+        try:
+            orders = [f"o{i}" for i in range(5)]
+            results = await asyncio.wait_for(asyncio.gather(*(gateway.place(o) for o in orders)), timeout=2.0)
+            return results, client.calls
+        finally:
+            gateway.close()
+
+    results, calls = asyncio.run(scenario())
+    assert [r["orderID"] for r in results] == [f"o{i}" for i in range(5)]
+    assert calls == [5]